@@ -4,8 +4,6 @@ import os
 import sys
 import time
 
-from torch.utils.data import DataLoader
-
 sys.path.append("..")
 sys.path.append("../../")
 from tqdm import tqdm
@@ -15,6 +13,7 @@ from code_search.twin.twin_train import load_examples
 
 import torch
 from transformers import BertConfig
+from common.data_structures import retrivial_task_dataloader
 from common.models import TBertS
 from common.metrices import metrics
 from common.utils import MODEL_FNAME, results_to_df, format_batch_input_for_single_bert
@@ -32,7 +31,8 @@ def test(args, model, eval_examples, chunk_size=1000):
         torch.save(chunked_retrivial_examples, cache_file)
     else:
         chunked_retrivial_examples = torch.load(cache_file)
-    retrival_dataloader = DataLoader(chunked_retrivial_examples, batch_size=args.per_gpu_eval_batch_size)
+    retrival_dataloader = retrivial_task_dataloader(chunked_retrivial_examples, args.per_gpu_eval_batch_size,
+                                                    eval_examples.get_pair_lengths(chunked_retrivial_examples))
 
     res = []
     for batch in tqdm(retrival_dataloader, desc="retrival evaluation"):
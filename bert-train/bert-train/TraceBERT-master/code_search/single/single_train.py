@@ -22,7 +22,7 @@ def train_single_iteration(args, model, train_examples: Examples, valid_examples
     # save the examples for epoch
     if args.neg_sampling == "random":
         if args.overwrite or not os.path.isfile(cache_file):
-            train_dataloader = train_examples.random_neg_sampling_dataloader(batch_size=batch_size)
+            train_dataloader = train_examples.random_neg_sampling_dataloader(batch_size=batch_size, length_bucketing=True)
             torch.save(train_dataloader, cache_file)
         else:
             train_dataloader = torch.load(cache_file)
@@ -4,8 +4,6 @@ import os
 import sys
 import time
 
-from torch.utils.data import DataLoader
-
 sys.path.append("..")
 sys.path.append("../..")
 
@@ -15,6 +13,7 @@ from common.metrices import metrics
 
 import torch
 from transformers import BertConfig
+from common.data_structures import retrivial_task_dataloader
 from common.models import TBertT
 from common.utils import MODEL_FNAME, results_to_df
 
@@ -52,7 +51,7 @@ def test(args, model, eval_examples, cache_file, batch_size=1000):
         torch.save(chunked_retrivial_examples, cache_file)
     else:
         chunked_retrivial_examples = torch.load(cache_file)
-    retrival_dataloader = DataLoader(chunked_retrivial_examples, batch_size=args.per_gpu_eval_batch_size)
+    retrival_dataloader = retrivial_task_dataloader(chunked_retrivial_examples, args.per_gpu_eval_batch_size)
     res = []
     for batch in tqdm(retrival_dataloader, desc="retrival evaluation"):
         nl_ids = batch[0]
@@ -98,7 +97,7 @@ if __name__ == "__main__":
     start_time = time.time()
     test_examples = load_examples(args.data_dir, data_type="test", model=model, overwrite=args.overwrite,
                                   num_limit=args.test_num)
-    test_examples.update_embd(model)
+    test_examples.update_embd(model, batch_size=args.per_gpu_eval_batch_size)
     m = test(args, model, test_examples, "cached_twin_test")
     exe_time = time.time() - start_time
     m.write_summary(exe_time)
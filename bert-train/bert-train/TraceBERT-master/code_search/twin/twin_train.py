@@ -142,7 +142,7 @@ def train_with_neg_sampling(args, model, train_examples: Examples, valid_example
 
             if args.valid_step > 0 and args.global_step % args.valid_step == 1:
                 # step invoke validation
-                valid_examples.update_embd(model)
+                valid_examples.update_embd(model, batch_size=args.per_gpu_eval_batch_size)
                 valid_accuracy, valid_loss = evaluate_classification(valid_examples, model,
                                                                      args.per_gpu_eval_batch_size,
                                                                      "evaluation/{}/runtime_eval".format(
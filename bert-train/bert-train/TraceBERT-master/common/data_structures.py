@@ -1,11 +1,13 @@
 import heapq
 import random
+from multiprocessing import Pool
 import numpy as np
+import scipy.sparse
 from collections import defaultdict
 from typing import List, Tuple
 
 import torch
-from torch.utils.data import DataLoader, RandomSampler
+from torch.utils.data import BatchSampler, DataLoader, Dataset, RandomSampler, Sampler, SequentialSampler
 from tqdm import tqdm
 
 from code_search.trace_rnn.rnn_model import RNNTracer
@@ -21,6 +23,11 @@ F_INPUT_ID = "input_ids"
 F_EMBD = "embd"
 F_TK_TYPE = "token_type_ids"
 
+# features are stored unpadded and truncated to this length
+MAX_SEQ_LENGTH = 512
+# number of texts tokenized in one call by update_features
+FEATURE_CHUNK_SIZE = 1000
+
 # epoch cache data name
 CLASSIFY_RANDON_CACHE = 'classify_random_epoch_{}.cache'
 CLASSIFY_NEG_SAMP_CACHE = 'classify_neg_epoch_{}.cache'
@@ -54,6 +61,241 @@ def clean_space(text):
     return " ".join(text.split())
 
 
+def gen_token_ids(texts, tokenizer):
+    """Token ids of the texts (with the special tokens), truncated to MAX_SEQ_LENGTH and unpadded"""
+    features = tokenizer.batch_encode_plus(texts, max_length=MAX_SEQ_LENGTH, return_attention_mask=False,
+                                           return_token_type_ids=False)
+    return features[F_INPUT_ID]
+
+
+# tokenizer of the update_features worker processes, set once per process instead of sent with every chunk
+_worker_tokenizer = None
+
+
+def _init_token_ids_worker(tokenizer):
+    global _worker_tokenizer
+    _worker_tokenizer = tokenizer
+
+
+def _gen_token_ids_in_worker(texts):
+    return gen_token_ids(texts, _worker_tokenizer)
+
+
+def truncate_longest_first(len_a, len_b, max_len):
+    """
+    Lengths of a sequence pair after the "longest_first" truncation of the tokenizers: tokens are removed one at a
+    time from the end of the longer sequence (of the second one if they are equally long) until they fit max_len.
+    """
+    remove = len_a + len_b - max_len
+    if remove <= 0:
+        return len_a, len_b
+    diff = min(abs(len_a - len_b), remove)
+    if len_a > len_b:
+        len_a -= diff
+    else:
+        len_b -= diff
+    remove -= diff
+    return len_a - remove // 2, len_b - (remove - remove // 2)
+
+
+def build_relevance_matrix(rel_index, nl_id_max, pl_id_max):
+    """
+    NL x PL relevance as a CSR matrix indexed by ids, 1 for the related pairs.
+    :param rel_index: nl_id -> set of related pl_ids
+    :param nl_id_max: largest NL id that will be looked up
+    :param pl_id_max: largest PL id that will be looked up
+    :return:
+    """
+    rows, cols = [], []
+    for nl_id, pl_ids in rel_index.items():
+        rows.extend([nl_id] * len(pl_ids))
+        cols.extend(pl_ids)
+    shape = (max([nl_id_max, *rows], default=-1) + 1, max([pl_id_max, *cols], default=-1) + 1)
+    return scipy.sparse.csr_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=shape)
+
+
+def lookup_relevance(relevance_matrix, nl_ids, pl_ids):
+    """Labels of the (nl_ids[i], pl_ids[i]) pairs, as an int64 array"""
+    if len(nl_ids) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.asarray(relevance_matrix[nl_ids, pl_ids], dtype=np.int64).ravel()
+
+
+class RetrivialTaskDataset(Dataset):
+    """
+    (nl_id, pl_id, label) examples of blocks of NL x PL cartesian products, generated from the example index
+    on the fly instead of materializing every pair. Examples are ordered by block, then by NL, then by PL.
+
+    Indexing with an int gives one example, indexing with a list of indices gives the whole batch as tensors, so
+    retrivial_task_dataloader() can fetch batches without collating single examples.
+    """
+
+    def __init__(self, blocks, relevance_matrix):
+        """
+        :param blocks: list of (nl_ids, pl_ids) arrays, each block is the cartesian product of the two
+        :param relevance_matrix: see build_relevance_matrix
+        """
+        self.relevance_matrix = relevance_matrix
+        nl_lens = np.array([len(nl_ids) for nl_ids, _ in blocks], dtype=np.int64)
+        self.pl_lens = np.array([len(pl_ids) for _, pl_ids in blocks], dtype=np.int64)
+        self.nl_ids = np.concatenate([np.asarray(nl_ids, dtype=np.int64) for nl_ids, _ in blocks] + [np.zeros(0, np.int64)])
+        self.pl_ids = np.concatenate([np.asarray(pl_ids, dtype=np.int64) for _, pl_ids in blocks] + [np.zeros(0, np.int64)])
+        self.nl_starts = np.concatenate([[0], np.cumsum(nl_lens)[:-1]]).astype(np.int64)
+        self.pl_starts = np.concatenate([[0], np.cumsum(self.pl_lens)[:-1]]).astype(np.int64)
+        self.block_offsets = np.concatenate([[0], np.cumsum(nl_lens * self.pl_lens)]).astype(np.int64)
+
+    def __len__(self):
+        return int(self.block_offsets[-1])
+
+    def get_examples(self, indices):
+        """The nl_ids, pl_ids and labels of the examples at the indices, as arrays"""
+        indices = np.asarray(indices, dtype=np.int64)
+        blocks = np.searchsorted(self.block_offsets, indices, side="right") - 1
+        offsets = indices - self.block_offsets[blocks]
+        pl_lens = self.pl_lens[blocks]
+        nl_ids = self.nl_ids[self.nl_starts[blocks] + offsets // pl_lens]
+        pl_ids = self.pl_ids[self.pl_starts[blocks] + offsets % pl_lens]
+        return nl_ids, pl_ids, lookup_relevance(self.relevance_matrix, nl_ids, pl_ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, (list, np.ndarray)):
+            nl_ids, pl_ids, labels = self.get_examples(index)
+            return torch.from_numpy(nl_ids), torch.from_numpy(pl_ids), torch.from_numpy(labels)
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError(index)
+        nl_ids, pl_ids, labels = self.get_examples([index])
+        return int(nl_ids[0]), int(pl_ids[0]), int(labels[0])
+
+
+class PairLengths:
+    """
+    Token lengths (NL + PL) of the examples of a RetrivialTaskDataset, computed from the example index on demand.
+    Index it with an array of example indices.
+    """
+
+    def __init__(self, dataset, nl_lengths, pl_lengths):
+        self.dataset = dataset
+        self.nl_lengths = nl_lengths
+        self.pl_lengths = pl_lengths
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, indices):
+        nl_ids, pl_ids, _ = self.dataset.get_examples(indices)
+        return self.nl_lengths[nl_ids] + self.pl_lengths[pl_ids]
+
+
+class LengthBucketBatchSampler(Sampler):
+    """
+    Batches of example indices with similar token lengths, so that padding each batch to its own longest example
+    leaves little padding. The examples are cut into buckets of bucket_batches * batch_size consecutive (or shuffled)
+    examples and each bucket is sorted by length before it is cut into batches.
+    """
+
+    def __init__(self, lengths, batch_size, shuffle=True, bucket_batches=50):
+        """
+        :param lengths: token length of each example, an array or a PairLengths
+        :param batch_size:
+        :param shuffle: shuffle the examples before bucketing and the batches of each bucket
+        :param bucket_batches: number of batches in a bucket
+        """
+        self.lengths = lengths
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.bucket_size = batch_size * bucket_batches
+
+    def __iter__(self):
+        size = len(self.lengths)
+        order = np.random.permutation(size) if self.shuffle else None
+        for start in range(0, size, self.bucket_size):
+            if order is None:
+                bucket = np.arange(start, min(start + self.bucket_size, size))
+            else:
+                bucket = order[start:start + self.bucket_size]
+            bucket = bucket[np.argsort(self.lengths[bucket], kind="stable")]
+            batches = [bucket[i:i + self.batch_size].tolist() for i in range(0, len(bucket), self.batch_size)]
+            if self.shuffle:
+                random.shuffle(batches)
+            yield from batches
+
+    def __len__(self):
+        size = len(self.lengths)
+        full_buckets, rest = divmod(size, self.bucket_size)
+        return full_buckets * (self.bucket_size // self.batch_size) + (rest + self.batch_size - 1) // self.batch_size
+
+
+def retrivial_task_dataloader(dataset, batch_size, lengths=None):
+    """
+    Batches of (nl_ids, pl_ids, labels) tensors. Each batch of a RetrivialTaskDataset is generated at once,
+    other datasets (e.g. lists of tuples loaded from older caches) are collated as usual.
+    :param lengths: see Examples.get_pair_lengths. If given, the batches are length bucketed, so they are not in order.
+    """
+    if lengths is not None:
+        sampler = LengthBucketBatchSampler(lengths, batch_size, shuffle=False)
+    else:
+        sampler = BatchSampler(SequentialSampler(dataset), batch_size=batch_size, drop_last=False)
+    if isinstance(dataset, RetrivialTaskDataset):
+        return DataLoader(dataset, batch_size=None, sampler=sampler)
+    return DataLoader(dataset, batch_sampler=sampler)
+
+
+class FeatureStore:
+    """
+    Token ids of the examples of an index in one flat int32 buffer, the ones of example id i are
+    token_ids[offsets[i]:offsets[i + 1]] (empty for ids without features). The attention masks are derived from the
+    lengths when a batch is gathered.
+    """
+
+    def __init__(self, token_ids, offsets, pad_token_id):
+        self.token_ids = token_ids
+        self.offsets = offsets
+        self.pad_token_id = pad_token_id
+
+    @staticmethod
+    def from_sequences(ids, sequences, pad_token_id):
+        """
+        :param ids: example ids
+        :param sequences: token ids of each example, unpadded
+        :param pad_token_id:
+        :return:
+        """
+        lengths = np.zeros(max(ids, default=-1) + 1, dtype=np.int64)
+        lengths[list(ids)] = [len(seq) for seq in sequences]
+        offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        token_ids = np.empty(offsets[-1], dtype=np.int32)
+        for id, seq in zip(ids, sequences):
+            token_ids[offsets[id]:offsets[id + 1]] = seq
+        return FeatureStore(token_ids, offsets, pad_token_id)
+
+    def get_lengths(self):
+        """Number of tokens of each example, as an array indexed by id"""
+        return np.diff(self.offsets)
+
+    def get(self, id):
+        """Token ids of the example, a view of the buffer"""
+        return self.token_ids[self.offsets[id]:self.offsets[id + 1]]
+
+    def gather(self, ids, pad_to=None):
+        """
+        Input and attention mask tensors of the examples
+        :param ids: example ids
+        :param pad_to: length of the tensors, the longest example of the batch if None
+        :return:
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        starts = self.offsets[ids]
+        lengths = self.offsets[ids + 1] - starts
+        seq_len = int(lengths.max(initial=0)) if pad_to is None else pad_to
+        positions = np.arange(seq_len)
+        att_mask = positions < lengths[:, None]
+        input_ids = np.full((len(ids), seq_len), self.pad_token_id, dtype=np.int64)
+        input_ids[att_mask] = self.token_ids[(starts[:, None] + positions)[att_mask]]
+        return torch.from_numpy(input_ids), torch.from_numpy(att_mask.astype(np.int64))
+
+
 class Examples:
     """
     Manage the examples read from raw dataset
@@ -68,12 +310,55 @@ class Examples:
 
     def __init__(self, raw_examples: List):
         self.NL_index, self.PL_index, self.rel_index = self.__index_exmaple(raw_examples)
-
-    def __is_positive_case(self, nl_id, pl_id):
-        if nl_id not in self.rel_index:
-            return False
-        rel_pls = set(self.rel_index[nl_id])
-        return pl_id in rel_pls
+        self.__relevance_matrix, self.__relevance_matrix_key = None, None
+        # token ids of the examples, see update_features
+        self.nl_features, self.pl_features = None, None
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # Examples cached before the features were moved out of the indexes into feature stores
+        if "nl_features" not in state:
+            self.nl_features = self.__pop_index_features(self.NL_index, self.__dict__.pop("nl_pad_token_id", None))
+            self.pl_features = self.__pop_index_features(self.PL_index, self.__dict__.pop("pl_pad_token_id", None))
+
+    def __pop_index_features(self, index, pad_token_id):
+        """
+        Move the features of the examples of the index into a FeatureStore, removing their padding
+        :param pad_token_id: None to take it from the padding
+        :return: the FeatureStore, None if the index has no features (or features without attention masks)
+        """
+        examples = [example for example in index.values() if F_ATTEN_MASK in example]
+        if len(examples) == 0:
+            return None
+        sequences = []
+        for example in examples:
+            length = sum(example[F_ATTEN_MASK])
+            if pad_token_id is None and length < len(example[F_INPUT_ID]):
+                pad_token_id = example[F_INPUT_ID][length]
+            sequences.append(example.pop(F_INPUT_ID)[:length])
+            del example[F_ATTEN_MASK]
+        ids = [example[F_ID] for example in examples]
+        return FeatureStore.from_sequences(ids, sequences, pad_token_id if pad_token_id is not None else 0)
+
+    def get_relevance_matrix(self):
+        """
+        The relevance matrix (see build_relevance_matrix) of rel_index. Cached until the indexes are replaced or
+        resized, some scripts build the indexes themselves after creating the Examples.
+        :return:
+        """
+        key = (id(self.rel_index), len(self.rel_index), sum(len(pl_ids) for pl_ids in self.rel_index.values()),
+               len(self.NL_index), len(self.PL_index))
+        # Examples loaded from older caches don't have the cache attributes
+        if getattr(self, "_Examples__relevance_matrix_key", None) != key:
+            self.__relevance_matrix = build_relevance_matrix(self.rel_index, max(self.NL_index, default=-1),
+                                                             max(self.PL_index, default=-1))
+            self.__relevance_matrix_key = key
+        return self.__relevance_matrix
+
+    def get_relevance_labels(self, nl_ids, pl_ids):
+        """Labels (1 for related, 0 otherwise) of the (nl_ids[i], pl_ids[i]) pairs, as an int64 array"""
+        return lookup_relevance(self.get_relevance_matrix(), np.asarray(nl_ids, dtype=np.int64),
+                                np.asarray(pl_ids, dtype=np.int64))
 
     def __len__(self):
         return len(self.rel_index)
@@ -118,112 +403,162 @@ class Examples:
             pl_id += 1
         return NL_index, PL_index, rel_index
 
-    def _gen_feature(self, example, tokenizer):
-        feature = tokenizer.encode_plus(example[F_TOKEN], max_length=512,
-                                        pad_to_max_length=True, return_attention_mask=True,
-                                        return_token_type_ids=False)
-        res = {
-            F_ID: example[F_ID],
-            F_INPUT_ID: feature[F_INPUT_ID],
-            F_ATTEN_MASK: feature[F_ATTEN_MASK]}
-        return res
-
     def _gen_seq_pair_feature(self, nl_id, pl_id, tokenizer):
-        nl_tks = self.NL_index[nl_id][F_TOKEN]
-        pl_tks = self.PL_index[pl_id][F_TOKEN]
-        feature = tokenizer.encode_plus(
-            text=nl_tks,
-            text_pair=pl_tks,
-            pad_to_max_length=True,
-            return_attention_mask=True,
-            return_token_type_ids=True,
-            max_length=512,
-            add_special_tokens=True
-        )
+        """
+        Unpadded features of the NL + PL pair. Assembled from the token ids of update_features with the special
+        tokens of the tokenizer and the same truncation as encode_plus, so the texts aren't tokenized again for every
+        pair. Tokenized if update_features wasn't called.
+        """
+        if self.nl_features is None or self.pl_features is None:
+            feature = tokenizer.encode_plus(
+                text=self.NL_index[nl_id][F_TOKEN],
+                text_pair=self.PL_index[pl_id][F_TOKEN],
+                return_attention_mask=True,
+                return_token_type_ids=True,
+                max_length=MAX_SEQ_LENGTH,
+                add_special_tokens=True
+            )
+            input_ids, tk_types = feature[F_INPUT_ID], feature[F_TK_TYPE]
+        else:
+            # the stored token ids have the special tokens of a single sequence around them, e.g. [CLS] nl [SEP]
+            single = tokenizer.build_inputs_with_special_tokens([-1])
+            prefix_len, suffix_len = single.index(-1), len(single) - single.index(-1) - 1
+            nl_tks = self.nl_features.get(nl_id)[prefix_len:]
+            pl_tks = self.pl_features.get(pl_id)[prefix_len:]
+            nl_tks, pl_tks = nl_tks[:len(nl_tks) - suffix_len], pl_tks[:len(pl_tks) - suffix_len]
+            # stored sequences are truncated to MAX_SEQ_LENGTH already, which doesn't change the pair truncation
+            max_len = MAX_SEQ_LENGTH - len(tokenizer.build_inputs_with_special_tokens([], []))
+            nl_len, pl_len = truncate_longest_first(len(nl_tks), len(pl_tks), max_len)
+            nl_tks, pl_tks = nl_tks[:nl_len].tolist(), pl_tks[:pl_len].tolist()
+            input_ids = tokenizer.build_inputs_with_special_tokens(nl_tks, pl_tks)
+            tk_types = tokenizer.create_token_type_ids_from_sequences(nl_tks, pl_tks)
         res = {
-            F_INPUT_ID: feature[F_INPUT_ID],
-            F_ATTEN_MASK: feature[F_ATTEN_MASK],
-            F_TK_TYPE: feature[F_TK_TYPE]
+            F_INPUT_ID: input_ids,
+            F_ATTEN_MASK: [1] * len(input_ids),
+            F_TK_TYPE: tk_types
         }
         return res
 
     def __update_feature_for_index(self, index, tokenizer, n_thread):
-        for v in tqdm(index.values(), desc="update feature"):
-            f = self._gen_feature(v, tokenizer)
-            id = f[F_ID]
-            index[id][F_INPUT_ID] = f[F_INPUT_ID]
-            index[id][F_ATTEN_MASK] = f[F_ATTEN_MASK]
-        # with Pool(n_thread) as p:
-        # worker = partial(self._gen_feature, tokenizer=tokenizer)
-        # features = list(tqdm(p.imap(worker, index.values(), chunksize=32), desc="update feature"))
-        # for f in features:
-        #     id = f[F_ID]
-        #     index[id][F_INPUT_ID] = f[F_INPUT_ID]
-        #     index[id][F_ATTEN_MASK] = f[F_ATTEN_MASK]
+        ids = list(index)
+        chunks = [[index[id][F_TOKEN] for id in ids[i:i + FEATURE_CHUNK_SIZE]]
+                  for i in range(0, len(ids), FEATURE_CHUNK_SIZE)]
+        sequences = []
+        # fast (Rust) tokenizers tokenize a batch in parallel themselves, slow ones are spread over processes
+        if n_thread > 1 and len(chunks) > 1 and not getattr(tokenizer, "is_fast", False):
+            with Pool(min(n_thread, len(chunks)), initializer=_init_token_ids_worker, initargs=(tokenizer,)) as p:
+                for chunk_sequences in tqdm(p.imap(_gen_token_ids_in_worker, chunks), total=len(chunks),
+                                            desc="update feature"):
+                    sequences.extend(chunk_sequences)
+        else:
+            for chunk in tqdm(chunks, desc="update feature"):
+                sequences.extend(gen_token_ids(chunk, tokenizer))
+        return FeatureStore.from_sequences(ids, sequences, tokenizer.pad_token_id)
 
     def update_features(self, model: TwinBert, n_thread=1):
         """
-        Create or overwritten token_ids and attention_mask
+        Create or overwritten the token ids (nl_features and pl_features), attention masks are derived from them
         :param model:
+        :param n_thread: number of worker processes for tokenizers without a fast (Rust) implementation
         :return:
         """
-        self.__update_feature_for_index(self.PL_index, model.get_pl_tokenizer(), n_thread)
-        self.__update_feature_for_index(self.NL_index, model.get_nl_tokenizer(), n_thread)
+        self.pl_features = self.__update_feature_for_index(self.PL_index, model.get_pl_tokenizer(), n_thread)
+        self.nl_features = self.__update_feature_for_index(self.NL_index, model.get_nl_tokenizer(), n_thread)
 
-    def __update_embd_for_index(self, index, sub_model):
-        for id in tqdm(index, desc="update embedding"):
-            feature = index[id]
-            input_tensor = torch.tensor(feature[F_INPUT_ID]).view(1, -1).to(sub_model.device)
-            mask_tensor = torch.tensor(feature[F_ATTEN_MASK]).view(1, -1).to(sub_model.device)
-            embd = sub_model(input_tensor, mask_tensor)[0]
-            embd_cpu = embd.to('cpu')
-            index[id][F_EMBD] = embd_cpu
+    def _get_feature_store(self, index):
+        return self.nl_features if index is self.NL_index else self.pl_features
 
-    def update_embd(self, model: TwinBert):
+    def get_pair_lengths(self, dataset):
+        """
+        NL + PL token lengths of the examples of a dataset of (nl_id, pl_id, label) examples, for length bucketing
+        :param dataset: a RetrivialTaskDataset or a list of tuples
+        :return: a PairLengths or an array
+        """
+        nl_lengths = self.nl_features.get_lengths()
+        pl_lengths = self.pl_features.get_lengths()
+        if isinstance(dataset, RetrivialTaskDataset):
+            return PairLengths(dataset, nl_lengths, pl_lengths)
+        nl_ids = np.array([example[0] for example in dataset], dtype=np.int64)
+        pl_ids = np.array([example[1] for example in dataset], dtype=np.int64)
+        return nl_lengths[nl_ids] + pl_lengths[pl_ids]
+
+    def __update_embd_for_index(self, index, sub_model, batch_size, trim_padding):
+        features = self._get_feature_store(index)
+        ids = np.fromiter(index, dtype=np.int64, count=len(index))
+        # longest first, so that a batch trimmed to its longest item has little padding left and the first batch
+        # shows whether the largest one fits in memory
+        ids = ids[np.argsort(-features.get_lengths()[ids], kind="stable")]
+        with tqdm(total=len(ids), desc="update embedding") as bar:
+            for start in range(0, len(ids), batch_size):
+                batch = ids[start:start + batch_size]
+                input_tensor, mask_tensor = features.gather(batch, pad_to=None if trim_padding else MAX_SEQ_LENGTH)
+                embd = sub_model(input_tensor.to(sub_model.device), mask_tensor.to(sub_model.device))[0].to('cpu')
+                if trim_padding:
+                    # zeros at the padded positions, so the embedding doesn't depend on the rest of the batch
+                    full_embd = embd.new_zeros((len(batch), MAX_SEQ_LENGTH, embd.size(2)))
+                    full_embd[:, :embd.size(1)] = embd * mask_tensor.unsqueeze(-1).to(embd.dtype)
+                    embd = full_embd
+                for i, id in enumerate(batch.tolist()):
+                    index[id][F_EMBD] = embd[i:i + 1].clone()
+                bar.update(len(batch))
+
+    def update_embd(self, model: TwinBert, batch_size=32, n_thread=None, trim_padding=False):
         """
         Create or overwritten the embedding
         :param model:
+        :param batch_size: number of examples run through the sub model at once
+        :param n_thread: number of threads torch uses on CPU while embedding, None to keep the current setting
+        :param trim_padding: run each batch trimmed to its longest example and store zeros at the padded positions.
+        Much faster for short texts, but the AvgPooler of the twin models averages over the padded positions too, so
+        their scores differ from the ones of untrimmed inputs (which training uses). Off by default.
         :return:
         """
-        with torch.no_grad():
-            model.eval()
-            self.__update_embd_for_index(self.NL_index, model.get_nl_sub_model())
-            self.__update_embd_for_index(self.PL_index, model.get_pl_sub_model())
+        num_threads = torch.get_num_threads()
+        if n_thread is not None:
+            torch.set_num_threads(n_thread)
+        # inference_mode is only available from torch 1.9 on
+        no_grad = torch.inference_mode if hasattr(torch, "inference_mode") else torch.no_grad
+        try:
+            with no_grad():
+                model.eval()
+                self.__update_embd_for_index(self.NL_index, model.get_nl_sub_model(), batch_size, trim_padding)
+                self.__update_embd_for_index(self.PL_index, model.get_pl_sub_model(), batch_size, trim_padding)
+        finally:
+            torch.set_num_threads(num_threads)
 
-    def get_retrivial_task_dataloader(self, batch_size):
-        """create retrivial task"""
-        res = []
-        for nl_id in self.NL_index:
-            for pl_id in self.PL_index:
-                label = 1 if self.__is_positive_case(nl_id, pl_id) else 0
-                res.append((nl_id, pl_id, label))
-        dataset = DataLoader(res, batch_size=batch_size)
-        return dataset
+    def get_retrivial_task_dataloader(self, batch_size, length_bucketing=False):
+        """
+        create retrivial task, every NL paired with every PL
+        :param length_bucketing: batch pairs of similar lengths together (for models padding the batches to their
+        longest pair), the batches are not in order then
+        """
+        nl_ids = np.fromiter(self.NL_index, dtype=np.int64, count=len(self.NL_index))
+        pl_ids = np.fromiter(self.PL_index, dtype=np.int64, count=len(self.PL_index))
+        dataset = RetrivialTaskDataset([(nl_ids, pl_ids)], self.get_relevance_matrix())
+        lengths = self.get_pair_lengths(dataset) if length_bucketing else None
+        return retrivial_task_dataloader(dataset, batch_size, lengths)
 
     def get_chunked_retrivial_task_examples(self, chunk_query_num=-1, chunk_size=1000):
         """
         Cut the positive examples into chuncks. For EACH chunk generate queries at a size of query_num * chunk_size
         :param query_num: if query_num is -1 then create queries at a size of chunk_size * chunk_size
         :param chunk_size:
-        :return:
+        :return: a RetrivialTaskDataset, use retrivial_task_dataloader() to iterate it in batches
         """
-        rels = []
+        rel_nids, rel_pids = [], []
         for nid in self.rel_index:
             for pid in self.rel_index[nid]:
-                rels.append((nid, pid))
-        rel_dl = DataLoader(rels, batch_size=chunk_size)
-        examples = []
-        for batch in rel_dl:
-            batch_query_idx = 0
-            nids, pids = batch[0].tolist(), batch[1].tolist()
-            for nid in nids:
-                batch_query_idx += 1
-                if chunk_query_num != -1 and batch_query_idx > chunk_query_num:
-                    break
-                for pid in pids:
-                    label = 1 if self.__is_positive_case(nid, pid) else 0
-                    examples.append((nid, pid, label))
-        return examples
+                rel_nids.append(nid)
+                rel_pids.append(pid)
+        rel_nids = np.array(rel_nids, dtype=np.int64)
+        rel_pids = np.array(rel_pids, dtype=np.int64)
+        blocks = []
+        for start in range(0, len(rel_nids), chunk_size):
+            nids = rel_nids[start:start + chunk_size]
+            if chunk_query_num != -1:
+                nids = nids[:chunk_query_num]
+            blocks.append((nids, rel_pids[start:start + chunk_size]))
+        return RetrivialTaskDataset(blocks, self.get_relevance_matrix())
 
     def id_pair_to_embd_pair(self, nl_id_tensor: Tensor, pl_id_tensor: Tensor) -> Tuple[Tensor, Tensor]:
         """Convert id pairs into embdding pairs"""
@@ -245,17 +580,18 @@ class Examples:
         return nl_input_tensor, nl_att_tensor, pos_pl_input_tensor, \
                pos_pl_att_tensor, neg_pl_input_tensor, neg_pl_att_tensor
 
-    def _id_to_feature(self, id_tensor: Tensor, index):
-        input_ids, att_masks = [], []
-        for id in id_tensor.tolist():
-            input_ids.append(torch.tensor(index[id][F_INPUT_ID]))
-            if F_ATTEN_MASK in index[id]:
-                att_masks.append(torch.tensor(index[id][F_ATTEN_MASK]))
-        input_tensor = torch.stack(input_ids)
-        att_tensor = None
-        if att_masks:
-            att_tensor = torch.stack(att_masks)
-        return input_tensor, att_tensor
+    def _id_to_feature(self, id_tensor: Tensor, index, pad_to=MAX_SEQ_LENGTH):
+        """
+        Input and attention mask tensors of the ids
+        :param pad_to: length the features are padded to, the longest of the batch if None. The twin models average
+        their hidden states over the padded positions too, so they need the same padding as in training.
+        """
+        features = self._get_feature_store(index)
+        if features is None:
+            # features set in the index by the RNN scripts, padded by their tokenizer and without attention mask
+            input_tensor = torch.stack([torch.tensor(index[id][F_INPUT_ID]) for id in id_tensor.tolist()])
+            return input_tensor, None
+        return features.gather(id_tensor.tolist(), pad_to=pad_to)
 
     def _id_to_embd(self, id_tensor: Tensor, index):
         embds = []
@@ -276,7 +612,11 @@ class Examples:
         dataset = DataLoader(triplets, batch_size=batch_size, sampler=sampler)
         return dataset
 
-    def random_neg_sampling_dataloader(self, batch_size):
+    def random_neg_sampling_dataloader(self, batch_size, length_bucketing=False):
+        """
+        :param length_bucketing: batch examples of similar lengths together, for models padding the batches to their
+        longest example
+        """
         pos, neg = [], []
         for nl_id in tqdm(self.rel_index, desc="random_neg_sampling_dataset"):
             pos_pl_ids = self.rel_index[nl_id]
@@ -286,6 +626,9 @@ class Examples:
             sel_neg_ids = exclude_and_sample(set(self.PL_index.keys()), pos_pl_ids, sample_num)
             for n_id in sel_neg_ids:
                 neg.append((nl_id, n_id, 0))
+        if length_bucketing:
+            batch_sampler = LengthBucketBatchSampler(self.get_pair_lengths(pos + neg), batch_size)
+            return DataLoader(pos + neg, batch_sampler=batch_sampler)
         sampler = RandomSampler(pos + neg)
         dataset = DataLoader(pos + neg, batch_size=batch_size, sampler=sampler)
         return dataset
@@ -300,7 +643,7 @@ class Examples:
         :return:
         """
         res = []
-        self.update_embd(model)  # use the updated embedding
+        self.update_embd(model, batch_size=batch_size)  # use the updated embedding
         dataloader = self.get_retrivial_task_dataloader(batch_size)
         total_batch = len(dataloader) * search_space_percent + 1
         # TODO  remove code dupliation
@@ -368,13 +711,13 @@ class Examples:
         pl_ids = batch[1].tolist()
         pos, neg = [], []
         cand_neg = []
-        for nl_id in nl_ids:
-            for pl_id in pl_ids:
-                label = 1 if self.__is_positive_case(nl_id, pl_id) else 0
-                if label == 0:
-                    cand_neg.append((nl_id, pl_id, 0))
-                else:
-                    pos.append((nl_id, pl_id, 1))
+        labels = self.get_relevance_labels(np.repeat(nl_ids, len(pl_ids)), np.tile(pl_ids, len(nl_ids))).tolist()
+        for i, label in enumerate(labels):
+            nl_id, pl_id = nl_ids[i // len(pl_ids)], pl_ids[i % len(pl_ids)]
+            if label == 0:
+                cand_neg.append((nl_id, pl_id, 0))
+            else:
+                pos.append((nl_id, pl_id, 1))
         neg_loader = DataLoader(cand_neg, batch_size=len(batch))
         neg_slots = len(pos)
         hard_neg_slots = max(1, int(hard_ratio * neg_slots))
@@ -412,11 +755,10 @@ class Examples:
         neg = defaultdict(list)
         cand_neg = []
         res = []
-        for nl_id in nl_ids:
-            for pl_id in pl_ids:
-                label = 1 if self.__is_positive_case(nl_id, pl_id) else 0
-                if label == 0:
-                    cand_neg.append((nl_id, pl_id, 0))
+        labels = self.get_relevance_labels(np.repeat(nl_ids, len(pl_ids)), np.tile(pl_ids, len(nl_ids))).tolist()
+        for i, label in enumerate(labels):
+            if label == 0:
+                cand_neg.append((nl_ids[i // len(pl_ids)], pl_ids[i % len(pl_ids)], 0))
 
         neg_loader = DataLoader(cand_neg, batch_size=len(batch))
         for neg_batch in neg_loader:
@@ -40,20 +40,38 @@ def format_rnn_batch_input(batch, examples, model):
     }
 
 
+def pad_features(sequences, pad_token_id, pad_to=None):
+    """
+    Collate token id sequences of different lengths into a padded input tensor and its attention mask
+    :param sequences: lists (or 1-D tensors) of token ids
+    :param pad_token_id: id filled in after the end of each sequence
+    :param pad_to: length of the padded tensors, the longest sequence of the batch if None
+    :return: input tensor, attention mask tensor
+    """
+    seq_len = max([len(seq) for seq in sequences], default=0) if pad_to is None else pad_to
+    input_tensor = torch.full((len(sequences), seq_len), pad_token_id, dtype=torch.long)
+    att_tensor = torch.zeros((len(sequences), seq_len), dtype=torch.long)
+    for i, seq in enumerate(sequences):
+        input_tensor[i, :len(seq)] = torch.as_tensor(seq, dtype=torch.long)
+        att_tensor[i, :len(seq)] = 1
+    return input_tensor, att_tensor
+
+
 def format_batch_input_for_single_bert(batch, examples, model):
+    """
+    Pair features of the batch, padded to the longest pair of the batch. Padding is masked out and the classifier
+    only reads the first token, so the scores are the same as with padding to the max length.
+    """
     tokenizer = model.tokenizer
     nl_ids, pl_ids, labels = batch[0].tolist(), batch[1].tolist(), batch[2].tolist()
     input_ids = []
-    att_masks = []
     tk_types = []
     for nid, pid, lb in zip(nl_ids, pl_ids, labels):
         encode = examples._gen_seq_pair_feature(nid, pid, tokenizer)
-        input_ids.append(torch.tensor(encode["input_ids"], dtype=torch.long))
-        att_masks.append(torch.tensor(encode["attention_mask"], dtype=torch.long))
-        tk_types.append(torch.tensor(encode["token_type_ids"], dtype=torch.long))
-    input_tensor = torch.stack(input_ids)
-    att_tensor = torch.stack(att_masks)
-    tk_type_tensor = torch.stack(tk_types)
+        input_ids.append(encode["input_ids"])
+        tk_types.append(encode["token_type_ids"])
+    input_tensor, att_tensor = pad_features(input_ids, tokenizer.pad_token_id)
+    tk_type_tensor, _ = pad_features(tk_types, 0)
     features = [input_tensor, att_tensor, tk_type_tensor]
     features = [t.to(model.device) for t in features]
     inputs = {
@@ -195,7 +213,8 @@ def evaluate_classification(eval_examples, model: TwinBert, batch_size, output_d
     :param append_label: append label to calculate evaluation_loss
     :return:
     """
-    eval_dataloader = eval_examples.random_neg_sampling_dataloader(batch_size=batch_size)
+    eval_dataloader = eval_examples.random_neg_sampling_dataloader(batch_size=batch_size,
+                                                                   length_bucketing=isinstance(model, TBertS))
 
     # multi-gpu evaluate
     # if args.n_gpu > 1 and not isinstance(model, torch.nn.DataParallel):
@@ -285,7 +304,7 @@ def evalute_retrivial_for_single_bert(model, eval_examples, batch_size, res_dir)
         os.makedirs(res_dir)
     retr_res_path = os.path.join(res_dir, "raw_result.csv")
     summary_path = os.path.join(res_dir, "summary.txt")
-    retrival_dataloader = eval_examples.get_retrivial_task_dataloader(batch_size)
+    retrival_dataloader = eval_examples.get_retrivial_task_dataloader(batch_size, length_bucketing=True)
     res = []
     for batch in tqdm(retrival_dataloader, desc="retrival evaluation"):
         nl_ids = batch[0]
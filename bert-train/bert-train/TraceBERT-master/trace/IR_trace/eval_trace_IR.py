@@ -15,7 +15,7 @@ from nltk.tokenize import word_tokenize
 
 import many_stop_words
 from pandas import DataFrame
-from torch.utils.data import DataLoader
+from common.data_structures import retrivial_task_dataloader
 from tqdm import tqdm
 from transformers import BertConfig
 
@@ -265,7 +265,7 @@ if __name__ == "__main__":
         torch.save(chunked_retrivial_examples, cache_file)
     else:
         chunked_retrivial_examples = torch.load(cache_file)
-    retrival_dataloader = DataLoader(chunked_retrivial_examples, batch_size=1000)
+    retrival_dataloader = retrivial_task_dataloader(chunked_retrivial_examples, 1000)
     start_time = time.time()
     res = []
     for batch in tqdm(retrival_dataloader, desc="retrival evaluation"):
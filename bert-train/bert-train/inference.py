@@ -43,30 +43,22 @@ def load_model(path: str):
     return model
 
 def get_scores(nl_list, pl_list, model):
-    input = {
-        "input_ids": [],
-        "attention_mask": [],
-        "token_type_ids": []
-    }
+    count = min(len(nl_list), len(pl_list))
     with torch.no_grad():
         model.eval()
-        for i in range(min(len(nl_list), len(pl_list))):
-            feature = model.tokenizer.encode_plus(
-                text=nl_list[i],
-                text_pair=pl_list[i],
-                #pad_to_max_length=True, # deprecated
-                padding="max_length",
-                return_attention_mask=True,
-                return_token_type_ids=True,
-                max_length=512,
-                add_special_tokens=True
-            )
-            input["input_ids"].append(torch.tensor(feature["input_ids"], dtype=torch.long))
-            input["attention_mask"].append(torch.tensor(feature["attention_mask"], dtype=torch.long))
-            input["token_type_ids"].append(torch.tensor(feature["token_type_ids"], dtype=torch.long))
-        input["input_ids"] = torch.stack(input["input_ids"]).to(model.device)
-        input["attention_mask"] = torch.stack(input["attention_mask"]).to(model.device)
-        input["token_type_ids"] = torch.stack(input["token_type_ids"]).to(model.device)
+        # padded to the longest pair, not to max_length: the padding is masked out and only the first token is classified
+        input = model.tokenizer(
+            text=nl_list[:count],
+            text_pair=pl_list[:count],
+            padding="longest",
+            truncation="longest_first",
+            return_attention_mask=True,
+            return_token_type_ids=True,
+            max_length=512,
+            add_special_tokens=True,
+            return_tensors="pt"
+        )
+        input = {key: input[key].to(model.device) for key in ["input_ids", "attention_mask", "token_type_ids"]}
         return model.get_sim_score(**input)
 
 if __name__ == "__main__":
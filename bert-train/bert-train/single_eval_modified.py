@@ -34,7 +34,7 @@ def test(args, model, eval_examples, chunk_size=1000):
         chunked_retrivial_examples = torch.load(cache_file)
     retrival_dataloader = DataLoader(chunked_retrivial_examples, batch_size=args.per_gpu_eval_batch_size)""" # Orig/REMOVED code
     # ADDED CODE BEGIN
-    retrival_dataloader = eval_examples.get_retrivial_task_dataloader(args.per_gpu_eval_batch_size)
+    retrival_dataloader = eval_examples.get_retrivial_task_dataloader(args.per_gpu_eval_batch_size, length_bucketing=True)
     # ADDED CODE END
 
     res = []
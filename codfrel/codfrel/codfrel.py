@@ -1,111 +1,324 @@
-import gensim
-import gensim.corpora
+import collections
+import concurrent.futures
+import csv
+import gzip
+import hashlib
+import importlib.util
+import inspect
+import io
+import itertools
 import json
-import multi_rake
-import nltk
-import nltk.stem
-import nltk.tokenize
+import multiprocessing
+import numpy as np
 import os
+import pickle
+import queue
 import random
 import sys
+import threading
 import time
 
+import codfrel_fitness
+import codfrel_preprocessing
+import codfrel_telemetry
 import codfrel_row_transform_functions
 
-POS_TAGS_TO_REMOVE = { "CC", "DT", "EX", "IN", "MD", "PDT", "POS", "PRP", "PRP$", "TO", "UH", "WDT", "WP", "WRB"}
-
-def _filter_pos_tag(tokens: list[str]) -> list[str]:
-    tokens = nltk.pos_tag(tokens)
-    return [ item[0] for item in tokens if item[1] not in POS_TAGS_TO_REMOVE ]
-
-def _lemmatization(tokens: list[str]) -> list[str]:
-    lemmatizer = nltk.stem.WordNetLemmatizer()
-    return [ lemmatizer.lemmatize(word) for word in tokens ]
-
-def nl_get_tokens(nl_text: str) -> list[str]:
-    # Tokenization
-    result = [ word.lower() for word in nltk.tokenize.word_tokenize(nl_text) if word.isalpha() ]
-    # POS Tagging
-    result = _filter_pos_tag(result)
-    # Lemmatization
-    result = _lemmatization(result)
-    return result
-
-def nl_get_keywords(nl_text: str) -> list[str]:
-    result = multi_rake.Rake().apply(nl_text)
-    result = nl_get_tokens(' '.join([item[0] for item in result]))
-    return result
-
-def _pl_tokenize_name(name: str) -> list[str]:
-    words = []
-    current_word = ""
-    for ch in name:
-        if ch.isalpha():
-            if len(current_word) != 0 and ch.isupper() and current_word[-1].islower():
-                words.append(current_word)
-                current_word = ""
-            current_word += ch
-        elif len(current_word) != 0:
-            words.append(current_word)
-            current_word = ""
-    if len(current_word) != 0:
-        words.append(current_word)
-        current_word = ""
-    return words
-
-def _pl_tokenize_names(names: list[str]) -> list[str]:
-    result = []
-    for name in names:
-        for word in _pl_tokenize_name(name):
-            result.append(word)
-    return result
-
-JAVA_RESERVED_WORDS = {
-    "abstract", "assert", "boolean", "break", "byte", "case", "catch", "char", "class", "const",
-    "continue", "default", "do", "double", "else", "enum", "extends", "final", "finally", "float",
-    "for", "goto", "if", "implements", "import", "instanceof", "int", "interface", "long", "native",
-    "new", "package", "private", "protected", "public", "return", "short", "static", "strictfp", "super",
-    "switch", "synchronized", "this", "throw", "throws", "transient", "try", "void", "volatile", "while",
-    "true", "false", "null",
-}
-
-def pl_get_tokens(pl_text: str) -> list[str]:
-    # Tokenization 1
-    result = ''.join([ ch if ch.isalpha() else ' ' for ch in pl_text ])
-    result = result.split()
-    # Reserved words removal
-    result = [ token for token in result if token not in JAVA_RESERVED_WORDS ]
-    # Tokenization 2
-    result = [ word.lower() for word in _pl_tokenize_names(result) ]
-    # POS Tagging
-    result = _filter_pos_tag(result)
-    # Lemmatization
-    result = _lemmatization(result)
-    return result
+try:
+    # Optional, a faster JSON parser for the dataset rows
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
 class NLItemInfo:
-    def __init__(self, nl_index: int, tokens: list[str], keywords: list[str]):
+    __slots__ = ("nl_index", "token_ids", "keyword_ids")
+
+    def __init__(self, nl_index: int, token_ids: np.ndarray, keyword_ids: np.ndarray):
         self.nl_index = nl_index
-        self.tokens = tokens
-        self.keywords = keywords
+        self.token_ids = token_ids # Views into the token id arrays of the PreprocessedCorpus
+        self.keyword_ids = keyword_ids
 
 class PLLineInfo:
-    def __init__(self, pl_index: int, line_index: int, global_pl_line_index: int, pl_item_total_lines: int, tokens: list[str]):
-        self.pl_index = pl_index
-        self.line_index = line_index
+    # A handle to a PL line of a PreprocessedCorpus, the data itself is stored in its arrays.
+    __slots__ = ("corpus", "global_pl_line_index")
+
+    def __init__(self, corpus: "PreprocessedCorpus", global_pl_line_index: int):
+        self.corpus = corpus
         self.global_pl_line_index = global_pl_line_index
-        self.pl_item_total_lines = pl_item_total_lines
-        self.tokens = tokens
+
+    @property
+    def pl_index(self) -> int:
+        return int(self.corpus.pl_line_pl_indices[self.global_pl_line_index])
+
+    @property
+    def line_index(self) -> int:
+        return int(self.corpus.pl_line_line_indices[self.global_pl_line_index])
+
+    @property
+    def pl_item_total_lines(self) -> int:
+        return int(self.corpus.pl_line_pl_item_total_lines[self.global_pl_line_index])
+
+    @property
+    def token_ids(self) -> np.ndarray:
+        return self.corpus.get_pl_line_token_ids(self.global_pl_line_index)
+
+    @property
+    def tokens(self) -> list[str]:
+        return self.corpus.get_tokens(self.token_ids)
 
 class PopulationItem:
-    def __init__(self, pl_lines: list[PLLineInfo], fitness_score: float = 0):
-        self.pl_lines = pl_lines
+    __slots__ = ("line_indices", "fitness_score")
+
+    def __init__(self, line_indices: np.ndarray, fitness_score: float = 0):
+        self.line_indices = line_indices # Sorted global PL line indices (int32), never modified in place
         self.fitness_score = fitness_score
 
+def _export_population(population: list[PopulationItem]) -> tuple[list[np.ndarray], list[float]]:
+    return [item.line_indices for item in population], [item.fitness_score for item in population]
+
+def _import_population(exported_population: tuple[list[np.ndarray], list[float]]) -> list[PopulationItem]:
+    line_indices_list, fitness_scores = exported_population
+    return [
+        PopulationItem(np.asarray(line_indices, dtype=np.int32), fitness_score)
+        for line_indices, fitness_score in zip(line_indices_list, fitness_scores)
+    ]
+
+PREPROCESSED_CORPUS_FORMAT_VERSION = 2
+
+def _get_offsets(lengths) -> np.ndarray:
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(lengths)
+    return offsets
+
+def _gather_ranges(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    # values[starts[0]:ends[0]] + values[starts[1]:ends[1]] + ..., without a Python loop
+    lengths = ends - starts
+    total_length = int(lengths.sum())
+    if total_length == 0:
+        return values[:0]
+    range_starts = np.repeat(starts - _get_offsets(lengths)[:-1], lengths)
+    return values[range_starts + np.arange(total_length)]
+
+class PreprocessedCorpus:
+    # Columnar: Tokens are ids into self.vocabulary, token lists are flat int32 arrays + int64 offsets.
+    def __init__(self,
+                 vocabulary: list[str],
+                 nl_token_ids: np.ndarray,
+                 nl_token_offsets: np.ndarray,
+                 nl_keyword_ids: np.ndarray,
+                 nl_keyword_offsets: np.ndarray,
+                 pl_line_token_ids: np.ndarray,
+                 pl_line_token_offsets: np.ndarray,
+                 pl_line_pl_indices: np.ndarray,
+                 pl_line_line_indices: np.ndarray,
+                 pl_line_pl_item_total_lines: np.ndarray,
+                 index_offsets: np.ndarray,
+                 index_pl_line_indices: np.ndarray):
+        self.vocabulary = vocabulary
+        self.nl_token_ids = nl_token_ids
+        self.nl_token_offsets = nl_token_offsets
+        self.nl_keyword_ids = nl_keyword_ids
+        self.nl_keyword_offsets = nl_keyword_offsets
+        self.pl_line_token_ids = pl_line_token_ids
+        self.pl_line_token_offsets = pl_line_token_offsets
+        self.pl_line_pl_indices = pl_line_pl_indices
+        self.pl_line_line_indices = pl_line_line_indices
+        self.pl_line_pl_item_total_lines = pl_line_pl_item_total_lines
+        # Inverted index, by token id: index_pl_line_indices[index_offsets[id]:index_offsets[id + 1]] are the sorted
+        # global indices of the PL lines containing the token.
+        self.index_offsets = index_offsets
+        self.index_pl_line_indices = index_pl_line_indices
+        self.pl_line_count = len(pl_line_pl_indices)
+        self.nl_items = [
+            NLItemInfo(
+                nl_index,
+                nl_token_ids[nl_token_offsets[nl_index]:nl_token_offsets[nl_index + 1]],
+                nl_keyword_ids[nl_keyword_offsets[nl_index]:nl_keyword_offsets[nl_index + 1]]
+            )
+            for nl_index in range(len(nl_token_offsets) - 1)
+        ]
+
+    @staticmethod
+    def preprocess(nl_list: list[str], pl_list: list[str], workers: int = 1) -> "PreprocessedCorpus":
+        vocabulary: dict[str, int] = {}
+        def to_ids_and_offsets(token_lists: list[list[str]]) -> tuple[np.ndarray, np.ndarray]:
+            offsets = _get_offsets([len(tokens) for tokens in token_lists])
+            ids = np.fromiter(
+                (vocabulary.setdefault(token, len(vocabulary)) for tokens in token_lists for token in tokens),
+                dtype=np.int32, count=int(offsets[-1])
+            )
+            return ids, offsets
+        # NL items
+        nl_token_ids, nl_token_offsets = to_ids_and_offsets(codfrel_preprocessing.nl_get_tokens_batch(nl_list, workers))
+        nl_keyword_ids, nl_keyword_offsets = to_ids_and_offsets(codfrel_preprocessing.nl_get_keywords_batch(nl_list, workers))
+        # PL lines
+        pl_line_counts = [len(pl.splitlines()) for pl in pl_list]
+        pl_line_token_ids, pl_line_token_offsets = to_ids_and_offsets(
+            codfrel_preprocessing.pl_get_tokens_batch([line for pl in pl_list for line in pl.splitlines()], workers)
+        )
+        pl_line_pl_indices = np.repeat(np.arange(len(pl_list), dtype=np.int32), pl_line_counts)
+        pl_line_pl_item_total_lines = np.repeat(np.array(pl_line_counts, dtype=np.int32), pl_line_counts)
+        pl_line_line_indices = (
+            np.arange(len(pl_line_pl_indices), dtype=np.int64) - np.repeat(_get_offsets(pl_line_counts)[:-1], pl_line_counts)
+        ).astype(np.int32)
+        # Inverted index, sorted by token id and then by line
+        token_lines = np.repeat(np.arange(len(pl_line_pl_indices), dtype=np.int64), np.diff(pl_line_token_offsets))
+        keys = np.unique(pl_line_token_ids.astype(np.int64) * max(1, len(pl_line_pl_indices)) + token_lines)
+        index_token_ids = keys // max(1, len(pl_line_pl_indices))
+        index_pl_line_indices = (keys % max(1, len(pl_line_pl_indices))).astype(np.int32)
+        index_offsets = _get_offsets(np.bincount(index_token_ids, minlength=len(vocabulary)))
+        return PreprocessedCorpus(
+            list(vocabulary),
+            nl_token_ids, nl_token_offsets, nl_keyword_ids, nl_keyword_offsets,
+            pl_line_token_ids, pl_line_token_offsets,
+            pl_line_pl_indices, pl_line_line_indices, pl_line_pl_item_total_lines,
+            index_offsets, index_pl_line_indices
+        )
+
+    def get_tokens(self, token_ids: np.ndarray) -> list[str]:
+        return [self.vocabulary[token_id] for token_id in token_ids.tolist()]
+
+    def get_pl_line(self, global_pl_line_index: int) -> PLLineInfo:
+        return PLLineInfo(self, global_pl_line_index)
+
+    def get_pl_line_token_ids(self, global_pl_line_index: int) -> np.ndarray:
+        return self.pl_line_token_ids[self.pl_line_token_offsets[global_pl_line_index]:self.pl_line_token_offsets[global_pl_line_index + 1]]
+
+    def get_pl_lines_token_ids(self, global_pl_line_indices: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # The token ids of the lines concatenated, and the number of token ids per line
+        starts = self.pl_line_token_offsets[global_pl_line_indices]
+        ends = self.pl_line_token_offsets[global_pl_line_indices + 1]
+        return _gather_ranges(self.pl_line_token_ids, starts, ends), ends - starts
+
+    def get_pl_line_indices_containing(self, token_id: int) -> np.ndarray:
+        return self.index_pl_line_indices[self.index_offsets[token_id]:self.index_offsets[token_id + 1]]
+
+    def save(self, path: str):
+        arrays = {
+            "format_version": np.array(PREPROCESSED_CORPUS_FORMAT_VERSION),
+            "vocabulary": np.array(self.vocabulary, dtype=str),
+            "nl_token_ids": self.nl_token_ids,
+            "nl_token_offsets": self.nl_token_offsets,
+            "nl_keyword_ids": self.nl_keyword_ids,
+            "nl_keyword_offsets": self.nl_keyword_offsets,
+            "pl_line_token_ids": self.pl_line_token_ids,
+            "pl_line_token_offsets": self.pl_line_token_offsets,
+            "pl_line_pl_indices": self.pl_line_pl_indices,
+            "pl_line_line_indices": self.pl_line_line_indices,
+            "pl_line_pl_item_total_lines": self.pl_line_pl_item_total_lines,
+            "index_offsets": self.index_offsets,
+            "index_pl_line_indices": self.index_pl_line_indices,
+        }
+        # Written to a temporary file first, so that an interrupted write never leaves a broken file behind.
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as file:
+            np.savez(file, **arrays)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def load(path: str) -> "PreprocessedCorpus|None":
+        with np.load(path) as arrays:
+            if int(arrays["format_version"]) != PREPROCESSED_CORPUS_FORMAT_VERSION:
+                return None
+            return PreprocessedCorpus(
+                arrays["vocabulary"].tolist(),
+                arrays["nl_token_ids"], arrays["nl_token_offsets"], arrays["nl_keyword_ids"], arrays["nl_keyword_offsets"],
+                arrays["pl_line_token_ids"], arrays["pl_line_token_offsets"],
+                arrays["pl_line_pl_indices"], arrays["pl_line_line_indices"], arrays["pl_line_pl_item_total_lines"],
+                arrays["index_offsets"], arrays["index_pl_line_indices"]
+            )
+
+def get_preprocessed_corpus_fingerprint(jsonl_file_path: str,
+                                        dataset_type: str,
+                                        max_links_count: int|None,
+                                        max_nl_count: int|None,
+                                        max_pl_count: int|None) -> str:
+    fingerprint = hashlib.sha256()
+    with open(jsonl_file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            fingerprint.update(chunk)
+    # Changes to the transform or preprocessing code also change the preprocessed corpus.
+    fingerprint.update(dataset_type.encode())
+    fingerprint.update(inspect.getsource(codfrel_row_transform_functions.nl_transforms[dataset_type]).encode())
+    fingerprint.update(inspect.getsource(codfrel_row_transform_functions.pl_transforms[dataset_type]).encode())
+    fingerprint.update(inspect.getsource(codfrel_preprocessing).encode())
+    fingerprint.update(str((max_links_count, max_nl_count, max_pl_count, PREPROCESSED_CORPUS_FORMAT_VERSION)).encode())
+    return fingerprint.hexdigest()
+
+CHECKPOINT_FILE_NAME = "checkpoint.pkl"
+CHECKPOINT_SHARD_SUFFIX = ".shard-" # + shard index, for the checkpoints of the worker processes
+CHECKPOINT_FORMAT_VERSION = 2
+
+TELEMETRY_FILE_NAME = "telemetry.jsonl"
+TELEMETRY_SHARD_SUFFIX = ".shard-" # + shard index, for the traces of the worker processes
+
+def _write_file_atomically(path: str, data: bytes):
+    # Written to a temporary file first, so that a crash during the write never leaves a broken file behind.
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+def load_checkpoint(path: str) -> dict|None:
+    with open(path, "rb") as file:
+        checkpoint = pickle.load(file)
+    if checkpoint["format_version"] != CHECKPOINT_FORMAT_VERSION:
+        return None
+    return checkpoint
+
+class CheckpointWriter:
+    # Writes checkpoints on a background thread. Only the latest pending checkpoint is kept.
+    def __init__(self, path: str):
+        self.path = path
+        self.queue: queue.Queue[bytes|None] = queue.Queue(maxsize=1)
+        self.thread = threading.Thread(target=self._write_loop, daemon=True)
+        self.thread.start()
+
+    def write(self, data: bytes):
+        try:
+            self.queue.get_nowait() # Drop the pending one
+        except queue.Empty:
+            pass
+        self.queue.put(data)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def _write_loop(self):
+        while True:
+            data = self.queue.get()
+            if data == None:
+                break
+            _write_file_atomically(self.path, data)
+
+# population-lsi: Trains an LSI model on each NL item and its population on every iteration.
+# corpus-lsi: Trains an LSI model on all PL lines once and folds the NL items in.
+# tfidf: Cosine similarity of TF-IDF vectors.
+# bm25: Okapi BM25 with the NL item as the query, normalized by its maximum.
+FITNESS_MODES = list(codfrel_fitness.fitness_backends)
+
+# Adaptive population (adaptive_population=True): The population size and the number of children of an iteration are
+# scaled by the diversity of the population (see get_population_diversity), and NL items with a converged population
+# (both below the CONVERGED_ values) aren't iterated anymore.
+# At and above either of these, the configured population size and number of children are used
+ADAPTIVE_FULL_LINE_DIVERSITY = 0.02
+ADAPTIVE_FULL_FITNESS_STD = 0.005
+ADAPTIVE_MIN_RATIO = 0.25 # The smallest population size and number of children, relative to the configured ones
+CONVERGED_LINE_DIVERSITY = 0.002
+CONVERGED_FITNESS_STD = 0.001
+
 class CodfrelGeneticAlgorithm:
     def __init__(self, nl_list: list[str], pl_list: list[str], population_number_per_NL: int,
                  number_of_parents: int = 7, number_of_children: int = 21,
-                 mutation_probability: int = 0.25, additive_mutation_probability: int = 0.5):
+                 mutation_probability: int = 0.25, additive_mutation_probability: int = 0.5,
+                 fitness_mode: str = "population-lsi", workers: int = 1,
+                 preprocessed_corpus: "PreprocessedCorpus|None" = None,
+                 state: dict|None = None,
+                 islands: int = 1, migration_interval: int = 10, migrants_count: int = 2,
+                 adaptive_population: bool = False):
         self.nl_raw_items = nl_list
         self.pl_raw_items = pl_list
         self.population_number_per_NL = population_number_per_NL
@@ -113,48 +326,359 @@ class CodfrelGeneticAlgorithm:
         self.number_of_children = number_of_children
         self.mutation_probability = mutation_probability
         self.additive_mutation_probability = additive_mutation_probability
+        self.fitness_mode = fitness_mode
+        self.workers = workers
+        # Island model: Each NL item gets multiple smaller populations (islands), iterated separately in the worker
+        # processes. Every migration_interval iterations, the top migrants_count items of each island are copied to
+        # the next island (ring), and self.populations gets the merged islands.
+        self.islands = islands
+        self.migration_interval = migration_interval
+        self.migrants_count = migrants_count
+        self.island_population_number_per_NL = max(1, population_number_per_NL // islands)
+        self.island_populations: dict[NLItemInfo, list[list[PopulationItem]]] = {}
+        self.adaptive_population = adaptive_population
+        # (line diversity, fitness standard deviation) by NL item, measured by the convergence check and used by the
+        # next iterate_population of the NL item, so that it's computed once per iteration
+        self.population_diversities: dict[NLItemInfo, tuple[float, float]] = {}
         self.nl_items: list[NLItemInfo] = []
-        self.pl_lines: list[PLLineInfo] = []
-        self.pl_lines_containing_keywords: dict[NLItemInfo, list[PLLineInfo]] = {}
+        self.pl_lines_containing_keywords: dict[NLItemInfo, np.ndarray] = {} # Sorted global PL line indices
         self.populations: dict[NLItemInfo, list[PopulationItem]] = {}
         self.global_iteration_number = 0
         self.iteration_numbers: dict[NLItemInfo, int] = {}
         self.interrupted_via_keyboard_interrupt = False
+        self.checkpoint_path: str|None = None
+        self.checkpoint_interval: float = 0
+        self.checkpoint_metadata: dict = {}
+        self.last_checkpoint_time = 0
+        self.telemetry: codfrel_telemetry.GATelemetry|None = None
+        self.population_initialization_time = 0.0 # Of the constructor, in seconds
 
-        # self.nl_items
-        for nl_index in range(len(self.nl_raw_items)):
-            nl = self.nl_raw_items[nl_index]
-            self.nl_items.append(NLItemInfo(nl_index, nl_get_tokens(nl), nl_get_keywords(nl)))
+        # Preprocessing
+        if preprocessed_corpus == None:
+            preprocessed_corpus = PreprocessedCorpus.preprocess(self.nl_raw_items, self.pl_raw_items, self.workers)
+        self.corpus = preprocessed_corpus
+        self.nl_items = preprocessed_corpus.nl_items
 
-        # self.pl_lines
-        for pl_index in range(len(self.pl_raw_items)):
-            pl = self.pl_raw_items[pl_index]
-            pl_lines_str = pl.splitlines()
-            for line_index in range(len(pl_lines_str)):
-                line = pl_lines_str[line_index]
-                self.pl_lines.append(PLLineInfo(pl_index, line_index, len(self.pl_lines), len(pl_lines_str), pl_get_tokens(line)))
+        # PL line info arrays, by global PL line index
+        self.pl_line_pl_indices = self.corpus.pl_line_pl_indices
+        self.pl_line_line_indices = self.corpus.pl_line_line_indices
+        self.pl_line_pl_item_total_lines = self.corpus.pl_line_pl_item_total_lines
+        self.all_pl_line_indices = np.arange(self.corpus.pl_line_count, dtype=np.int32)
+        self.nonempty_pl_line_indices = np.flatnonzero(np.diff(self.corpus.pl_line_token_offsets) != 0).astype(np.int32)
 
         # self.pl_lines_containing_keywords
         for nl in self.nl_items:
-            self.pl_lines_containing_keywords[nl] = []
-            for pl_line in self.pl_lines:
-                if any(keyword in pl_line.tokens for keyword in nl.keywords):
-                    self.pl_lines_containing_keywords[nl].append(pl_line)
+            self.pl_lines_containing_keywords[nl] = self._get_pl_line_indices_containing_any(nl.keyword_ids)
+
+        # Fitness, corpus-wide models are created here, once
+        self.fitness_backend: codfrel_fitness.FitnessBackend = codfrel_fitness.fitness_backends[self.fitness_mode](self.corpus)
 
         # self.populations
+        population_initialization_start = time.perf_counter()
+        if state != None:
+            # Resume
+            self.set_state(state)
+        elif self.islands > 1:
+            self._initialize_islands()
+        elif self.workers > 1:
+            for results in self._map_nl_shards_in_workers(_worker_initialize_populations):
+                self._import_populations(results)
+        else:
+            for nl in self.nl_items:
+                self.initialize_population(nl)
+        self.population_initialization_time = time.perf_counter() - population_initialization_start
+        if state == None:
+            for nl in self.nl_items:
+                self.iteration_numbers[nl] = 0
+
+    def add_nl_item(self, nl_item: NLItemInfo):
+        # For NL items that aren't in the preprocessed corpus, e.g. the queries of codfrel_service
+        self.nl_items = self.nl_items + [nl_item]
+        self.pl_lines_containing_keywords[nl_item] = self._get_pl_line_indices_containing_any(nl_item.keyword_ids)
+        self.iteration_numbers[nl_item] = 0
+        self.initialize_population(nl_item)
+
+    def remove_nl_item(self, nl_item: NLItemInfo):
+        self.nl_items = [nl for nl in self.nl_items if nl != nl_item]
+        del self.pl_lines_containing_keywords[nl_item]
+        del self.iteration_numbers[nl_item]
+        del self.populations[nl_item]
+        self.population_diversities.pop(nl_item, None)
+        self.fitness_backend.remove_nl_item(nl_item)
+
+    def _get_pl_line_indices_containing_any(self, token_ids: np.ndarray) -> np.ndarray:
+        postings = [self.corpus.get_pl_line_indices_containing(token_id) for token_id in np.unique(token_ids).tolist()]
+        postings = [item for item in postings if len(item) != 0]
+        if len(postings) == 0:
+            return np.zeros(0, dtype=np.int32)
+        return np.unique(np.concatenate(postings))
+
+    def _export_populations(self, nl_items: list[NLItemInfo]) -> dict[int, tuple[list[np.ndarray], list[float]]]:
+        return {nl.nl_index: _export_population(self.populations[nl]) for nl in nl_items}
+
+    def _import_populations(self, populations: dict[int, tuple[list[np.ndarray], list[float]]]):
+        nl_items_by_index = {nl.nl_index: nl for nl in self.nl_items}
+        for nl_index in populations:
+            self.populations[nl_items_by_index[nl_index]] = _import_population(populations[nl_index])
+
+    def get_state(self) -> dict:
+        # Everything that changes during run(), with NL items replaced by their indices
+        stopping_condition_state = {}
+        for key in self.__dict__:
+            if key.startswith("stopping_condition_"):
+                value = self.__dict__[key]
+                if isinstance(value, dict) and any(isinstance(k, NLItemInfo) for k in value):
+                    stopping_condition_state[key] = ("by_nl_index", {k.nl_index: value[k] for k in value})
+                else:
+                    stopping_condition_state[key] = ("value", value)
+        return {
+            "nl_indices": [nl.nl_index for nl in self.nl_items],
+            "populations": self._export_populations(self.nl_items),
+            "island_populations": {
+                nl.nl_index: [_export_population(island) for island in self.island_populations[nl]]
+                for nl in self.nl_items if nl in self.island_populations
+            },
+            "iteration_numbers": {nl.nl_index: self.iteration_numbers[nl] for nl in self.nl_items},
+            "global_iteration_number": self.global_iteration_number,
+            "stopping_condition_state": stopping_condition_state,
+            "random_state": random.getstate(),
+            "time": time.time(),
+        }
+
+    def set_state(self, state: dict):
+        nl_items_by_index = {nl.nl_index: nl for nl in self.nl_items}
+        self._import_populations(state["populations"])
+        self.population_diversities = {}
+        for nl_index in state["island_populations"]:
+            self.island_populations[nl_items_by_index[nl_index]] = [
+                _import_population(island) for island in state["island_populations"][nl_index]
+            ]
+        for nl_index in state["iteration_numbers"]:
+            self.iteration_numbers[nl_items_by_index[nl_index]] = state["iteration_numbers"][nl_index]
+        self.global_iteration_number = state["global_iteration_number"]
+        paused_time = time.time() - state["time"]
+        for key in state["stopping_condition_state"]:
+            kind, value = state["stopping_condition_state"][key]
+            if kind == "by_nl_index":
+                value = {nl_items_by_index[nl_index]: value[nl_index] for nl_index in value if nl_index in nl_items_by_index}
+            elif key.endswith("_time"):
+                # Points in time, the time between the checkpoint and now doesn't count
+                value += paused_time
+            self.__dict__[key] = value
+        random.setstate(state["random_state"])
+
+    def enable_checkpoints(self, path: str, interval: float, metadata: dict):
+        # metadata: Saved with the checkpoints, e.g. to know how to resume
+        self.checkpoint_path = path
+        self.checkpoint_interval = interval
+        self.checkpoint_metadata = metadata
+        self.last_checkpoint_time = time.time()
+
+    def _get_checkpoint_data(self, run_finished: bool) -> bytes:
+        return pickle.dumps({
+            "format_version": CHECKPOINT_FORMAT_VERSION,
+            "metadata": self.checkpoint_metadata,
+            "ga_state": self.get_state(),
+            "run_finished": run_finished,
+        })
+
+    def write_checkpoint(self, run_finished: bool = False):
+        _write_file_atomically(self.checkpoint_path, self._get_checkpoint_data(run_finished))
+        self.last_checkpoint_time = time.time()
+
+    def _map_nl_shards_in_workers(self, worker_function, stopping_condition=None) -> list:
+        global _worker_ga, _worker_stopping_condition
+        shards = [
+            [nl.nl_index for nl in self.nl_items[shard_index::self.workers]]
+            for shard_index in range(min(self.workers, len(self.nl_items)))
+        ]
+        # Each shard gets its own RNG stream, derived from the main one, so seeding random makes runs reproducible.
+        seed = random.getrandbits(32)
+        # The worker processes are forked, so they inherit these without pickling the GA.
+        _worker_ga = self
+        _worker_stopping_condition = stopping_condition
+        try:
+            with concurrent.futures.ProcessPoolExecutor(
+                len(shards), mp_context=multiprocessing.get_context("fork")
+            ) as executor:
+                futures = [
+                    executor.submit(worker_function, shard_index, shards[shard_index], seed + shard_index)
+                    for shard_index in range(len(shards))
+                ]
+                try:
+                    return [future.result() for future in futures]
+                except KeyboardInterrupt:
+                    print("\nKeyboard interrupt. Waiting for the workers to finish...")
+                    return [future.result() for future in futures]
+        finally:
+            _worker_ga = None
+            _worker_stopping_condition = None
+
+    def _run_in_workers(self, stopping_condition):
+        results = self._map_nl_shards_in_workers(_worker_run, stopping_condition)
+        for (global_iteration_number, iteration_numbers, interrupted, populations, telemetry_totals) in results:
+            self.global_iteration_number = max(self.global_iteration_number, global_iteration_number)
+            for nl_index in iteration_numbers:
+                self.iteration_numbers[self.nl_items[nl_index]] = iteration_numbers[nl_index]
+            self._import_populations(populations)
+            if self.telemetry != None:
+                self.telemetry.merge_totals(telemetry_totals)
+        self.interrupted_via_keyboard_interrupt = any(result[2] for result in results)
+        if self.checkpoint_path != None and not self.interrupted_via_keyboard_interrupt:
+            self.write_checkpoint(run_finished=True)
+            for shard_index in range(len(results)):
+                shard_checkpoint_path = self.checkpoint_path + CHECKPOINT_SHARD_SUFFIX + str(shard_index)
+                if os.path.isfile(shard_checkpoint_path):
+                    os.remove(shard_checkpoint_path)
+
+    def _initialize_islands(self):
+        global _worker_ga
+        tasks = [(nl, island_index) for nl in self.nl_items for island_index in range(self.islands)]
+        seed = random.getrandbits(32)
+        _worker_ga = self
+        try:
+            with concurrent.futures.ProcessPoolExecutor(
+                min(self.workers, len(tasks)), mp_context=multiprocessing.get_context("fork")
+            ) as executor:
+                results = list(executor.map(
+                    _worker_initialize_island,
+                    [nl.nl_index for nl, island_index in tasks],
+                    [seed + task_index for task_index in range(len(tasks))]
+                ))
+        finally:
+            _worker_ga = None
+        for nl in self.nl_items:
+            self.island_populations[nl] = []
+        for (nl, island_index), island in zip(tasks, results):
+            self.island_populations[nl].append(_import_population(island))
+        for nl in self.nl_items:
+            self._merge_islands(nl)
+
+    def _migrate(self, nl: NLItemInfo):
+        islands = self.island_populations[nl]
+        # Islands are sorted, the migrants are the top items
+        migrants = [island[:self.migrants_count] for island in islands]
+        for island_index in range(len(islands)):
+            target = islands[(island_index + 1) % len(islands)]
+            target.extend(PopulationItem(item.line_indices, item.fitness_score) for item in migrants[island_index])
+            self._remove_population_duplicates(target)
+            self._sort_population(target)
+            del target[self.island_population_number_per_NL:]
+
+    def _merge_islands(self, nl: NLItemInfo, recalculate_fitness: bool = False):
+        population = [
+            PopulationItem(item.line_indices, item.fitness_score) for island in self.island_populations[nl] for item in island
+        ]
+        self.populations[nl] = population
+        self._remove_population_duplicates(population)
+        if recalculate_fitness:
+            self.calculate_population_fitness(nl)
+        self._sort_and_trim_population(nl)
+
+    def _run_islands(self, stopping_condition):
+        global _worker_ga
+        checkpoint_writer = CheckpointWriter(self.checkpoint_path) if self.checkpoint_path != None else None
+        self.interrupted_via_keyboard_interrupt = False
+        _worker_ga = self
+        try:
+            # The worker processes are forked once and get the islands as arguments on every epoch.
+            with concurrent.futures.ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context("fork")
+            ) as executor:
+                # The stopping condition is checked between epochs (migration_interval iterations)
+                nls_to_iterate = self._get_nls_to_iterate(stopping_condition)
+                while len(nls_to_iterate) != 0:
+                    tasks = [(nl, island_index) for nl in nls_to_iterate for island_index in range(self.islands)]
+                    seed = random.getrandbits(32)
+                    futures = [
+                        executor.submit(
+                            _worker_iterate_island,
+                            nl.nl_index,
+                            _export_population(self.island_populations[nl][island_index]),
+                            self.migration_interval,
+                            seed + task_index
+                        )
+                        for task_index, (nl, island_index) in enumerate(tasks)
+                    ]
+                    try:
+                        results = [future.result() for future in futures]
+                    except KeyboardInterrupt:
+                        print("\nKeyboard interrupt. Waiting for the workers to finish...")
+                        results = [future.result() for future in futures]
+                        self.interrupted_via_keyboard_interrupt = True
+                    completed_iterations = {nl: 0 for nl in nls_to_iterate}
+                    for (nl, island_index), (island, island_completed_iterations, interrupted, telemetry_totals) in zip(tasks, results):
+                        self.island_populations[nl][island_index] = _import_population(island)
+                        completed_iterations[nl] = max(completed_iterations[nl], island_completed_iterations)
+                        if interrupted:
+                            self.interrupted_via_keyboard_interrupt = True
+                        if self.telemetry != None and nl.nl_index in telemetry_totals["phase_times_by_nl"]:
+                            self.telemetry.add_iteration(
+                                nl.nl_index,
+                                telemetry_totals["phase_times_by_nl"][nl.nl_index],
+                                telemetry_totals["counters_by_nl"][nl.nl_index]
+                            )
+                    for nl in nls_to_iterate:
+                        self.iteration_numbers[nl] += completed_iterations[nl]
+                        self._migrate(nl)
+                        self._merge_islands(nl)
+                    self.global_iteration_number += self.migration_interval
+                    if self.telemetry != None:
+                        self.telemetry.end_global_iteration(self.global_iteration_number - self.migration_interval, len(nls_to_iterate))
+                    if self.interrupted_via_keyboard_interrupt:
+                        break
+                    if checkpoint_writer != None and time.time() - self.last_checkpoint_time >= self.checkpoint_interval:
+                        checkpoint_writer.write(self._get_checkpoint_data(run_finished=False))
+                        self.last_checkpoint_time = time.time()
+                    nls_to_iterate = self._get_nls_to_iterate(stopping_condition)
+            # The fitness scores of population relative backends (population-lsi) are relative to their island
+            for nl in self.nl_items:
+                self._merge_islands(nl, recalculate_fitness=self.fitness_backend.population_relative)
+            if checkpoint_writer != None and not self.interrupted_via_keyboard_interrupt:
+                checkpoint_writer.write(self._get_checkpoint_data(run_finished=True))
+        finally:
+            _worker_ga = None
+            if checkpoint_writer != None:
+                checkpoint_writer.close()
+
+    def _get_nls_to_iterate(self, stopping_condition) -> list[NLItemInfo]:
+        # The stopping condition is called for every NL item in order, it may keep state across them
+        self.population_diversities = {}
+        nls_to_iterate = []
         for nl in self.nl_items:
-            self.initialize_population(nl)
-            self.iteration_numbers[nl] = 0
+            if stopping_condition(self, nl):
+                continue
+            if self.adaptive_population:
+                self.population_diversities[nl] = self.get_population_diversity(nl)
+                if self.is_population_converged(nl, self.population_diversities[nl]):
+                    continue
+            nls_to_iterate.append(nl)
+        return nls_to_iterate
 
     def run(self, stopping_condition):
+        if self.islands > 1:
+            self._run_islands(stopping_condition)
+            return
+        if self.workers > 1:
+            self._run_in_workers(stopping_condition)
+            return
+        checkpoint_writer = CheckpointWriter(self.checkpoint_path) if self.checkpoint_path != None else None
         try:
-            nls_to_iterate = [nl for nl in self.nl_items if not stopping_condition(self, nl)]
+            nls_to_iterate = self._get_nls_to_iterate(stopping_condition)
             while len(nls_to_iterate) != 0:
                 for nl in nls_to_iterate:
                     self.iterate_population(nl)
                 self.global_iteration_number += 1
-                nls_to_iterate = [nl for nl in self.nl_items if not stopping_condition(self, nl)]
+                if self.telemetry != None:
+                    self.telemetry.end_global_iteration(self.global_iteration_number - 1, len(nls_to_iterate))
+                # Between global iterations, so that resuming continues with the same stopping condition calls
+                if checkpoint_writer != None and time.time() - self.last_checkpoint_time >= self.checkpoint_interval:
+                    checkpoint_writer.write(self._get_checkpoint_data(run_finished=False))
+                    self.last_checkpoint_time = time.time()
+                nls_to_iterate = self._get_nls_to_iterate(stopping_condition)
             self.interrupted_via_keyboard_interrupt = False
+            if checkpoint_writer != None:
+                checkpoint_writer.write(self._get_checkpoint_data(run_finished=True))
         except KeyboardInterrupt:
             print("\nKeyboard interrupt. Stopping and finishing GA run...")
             for nl in self.nl_items:
@@ -162,93 +686,107 @@ class CodfrelGeneticAlgorithm:
                 self.calculate_population_fitness(nl)
                 self._sort_and_trim_population(nl)
             self.interrupted_via_keyboard_interrupt = True
+            # The last checkpoint is kept as is, resuming from it continues exactly where it was written.
+        finally:
+            if checkpoint_writer != None:
+                checkpoint_writer.close()
 
     def _sort_population(self, population: list[PopulationItem]):
         population.sort(key=lambda x: x.fitness_score, reverse=True)
 
-    def _sort_and_trim_population(self, nl: NLItemInfo):
+    def _sort_and_trim_population(self, nl: NLItemInfo, population_number: int|None = None):
+        if population_number == None:
+            population_number = self.population_number_per_NL
         self._sort_population(self.populations[nl])
-        if len(self.populations[nl]) > self.population_number_per_NL:
-            self.populations[nl] = self.populations[nl][:self.population_number_per_NL]
+        if len(self.populations[nl]) > population_number:
+            self.populations[nl] = self.populations[nl][:population_number]
 
-    def _sort_item_pl_lines(self, pl_lines: list[PLLineInfo]):
-        pl_lines.sort(key=lambda x: x.global_pl_line_index)
+    def get_population_diversity(self, nl_item: NLItemInfo) -> tuple[float, float]:
+        # Returns (line diversity, fitness standard deviation) of the population.
+        # The line diversity is the number of unique lines in the population beyond the lines of an average item,
+        # relative to a full population without common lines: 0 if all items have the same lines, up to 1.
+        # It's relative to the configured population size, not the current one, so shrinking the population
+        # doesn't make it look more diverse.
+        population = self.populations[nl_item]
+        if len(population) == 0:
+            return 0.0, 0.0
+        mean_length = sum(len(item.line_indices) for item in population) / len(population)
+        if mean_length == 0:
+            line_diversity = 0.0
+        else:
+            unique_line_count = len(np.unique(np.concatenate([item.line_indices for item in population])))
+            line_diversity = min(1.0, (unique_line_count - mean_length) / (max(1, self.population_number_per_NL - 1) * mean_length))
+        return line_diversity, float(np.std([item.fitness_score for item in population]))
+
+    def is_population_converged(self, nl_item: NLItemInfo, diversity: tuple[float, float]|None = None) -> bool:
+        # diversity: The result of get_population_diversity, if it's already known
+        if not self.adaptive_population:
+            return False
+        line_diversity, fitness_std = diversity if diversity != None else self.get_population_diversity(nl_item)
+        return line_diversity < CONVERGED_LINE_DIVERSITY and fitness_std < CONVERGED_FITNESS_STD
+
+    def _get_adaptive_ratio(self, nl_item: NLItemInfo, diversity: tuple[float, float]|None = None) -> float:
+        # The ratio of the configured population size and number of children to use in the next iteration
+        if not self.adaptive_population:
+            return 1.0
+        line_diversity, fitness_std = diversity if diversity != None else self.get_population_diversity(nl_item)
+        diversity_ratio = max(line_diversity / ADAPTIVE_FULL_LINE_DIVERSITY, fitness_std / ADAPTIVE_FULL_FITNESS_STD)
+        return min(1.0, max(ADAPTIVE_MIN_RATIO, diversity_ratio))
 
     def _is_guided_selection_completely_random(self, nl_item: NLItemInfo):
         return len(self.pl_lines_containing_keywords[nl_item]) == 0
 
-    def _get_guided_selection_list(self, nl_item: NLItemInfo) -> list[PLLineInfo]:
+    def _get_guided_selection_list(self, nl_item: NLItemInfo) -> np.ndarray:
         completely_random = self._is_guided_selection_completely_random(nl_item)
-        return self.pl_lines if completely_random else self.pl_lines_containing_keywords[nl_item]
-
-    def _select_new_guided_random_lines(self, selection_list: list[PLLineInfo]) -> list[PLLineInfo]:
-        selection_center = random.choice(selection_list)
-        lines_before = random.randrange(0, selection_center.line_index + 1)
-        lines_after = random.randrange(0, selection_center.pl_item_total_lines - selection_center.line_index)
-        start = selection_center.global_pl_line_index - lines_before
-        stop = selection_center.global_pl_line_index + lines_after + 1
-        lines = self.pl_lines[start:stop]
-        # Remove empty lines
-        i = 0
-        while i < len(lines):
-            if len(lines[i].tokens) == 0:
-                lines.pop(i)
-            else:
-                i += 1
-        return lines
+        return self.all_pl_line_indices if completely_random else self.pl_lines_containing_keywords[nl_item]
+
+    def _select_new_guided_random_lines(self, selection_list: np.ndarray) -> np.ndarray:
+        selection_center = int(selection_list[random.randrange(len(selection_list))])
+        line_index = int(self.pl_line_line_indices[selection_center])
+        lines_before = random.randrange(0, line_index + 1)
+        lines_after = random.randrange(0, int(self.pl_line_pl_item_total_lines[selection_center]) - line_index)
+        start = selection_center - lines_before
+        stop = selection_center + lines_after + 1
+        # The non-empty lines in [start, stop)
+        nonempty = self.nonempty_pl_line_indices
+        return nonempty[np.searchsorted(nonempty, start):np.searchsorted(nonempty, stop)]
 
     def _remove_population_duplicates(self, population: list[PopulationItem]):
         population_keys = set()
-        i = 0
-        while i < len(population):
-            key = ",".join([str(item.global_pl_line_index) for item in population[i].pl_lines])
+        unique_items = []
+        for item in population:
+            key = item.line_indices.tobytes()
             if key not in population_keys: # New
                 population_keys.add(key)
-                i += 1
-            else: # Repetitive
-                population.pop(i)
-                # No i increment
+                unique_items.append(item)
+        population[:] = unique_items
 
     def initialize_population(self, nl_item: NLItemInfo):
         if self._is_guided_selection_completely_random(nl_item):
             print("[Warning]: No PL line containing the NL keywords of NL[" + str(nl_item.nl_index) + "]. Randomly choosing for initialization.")
         population: list[PopulationItem] = []
         self.populations[nl_item] = population
+        self.population_diversities.pop(nl_item, None)
         selection_list = self._get_guided_selection_list(nl_item)
         for i in range(self.population_number_per_NL):
-            item_pl_lines = self._select_new_guided_random_lines(selection_list)
-            # Already sorted, no need to _sort_item_pl_lines.
-            population.append(PopulationItem(item_pl_lines))
+            population.append(PopulationItem(self._select_new_guided_random_lines(selection_list)))
         self._remove_population_duplicates(population)
         self.calculate_population_fitness(nl_item)
         self._sort_population(population)
 
     def calculate_population_fitness(self, nl_item: NLItemInfo):
         population = self.populations[nl_item]
-        texts: list[list[str]] = []
-        # PL items
-        for item in population:
-            text: list[str] = []
-            for line in item.pl_lines:
-                text += line.tokens
-            texts.append(text)
-        # NL item
-        texts.append(nl_item.tokens)
-        # LSI
-        dictionary = gensim.corpora.Dictionary(texts)
-        corpus = [dictionary.doc2bow(text) for text in texts]
-        lsi_model = gensim.models.LsiModel(
-            corpus=corpus, id2word=dictionary, num_topics=20
-        )
-        nl_vec = lsi_model[dictionary.doc2bow(nl_item.tokens)]
+        scores = self.fitness_backend.calculate_scores(nl_item, [item.line_indices for item in population])
         for i in range(len(population)):
-            cossim = gensim.matutils.cossim(
-                nl_vec,
-                lsi_model[dictionary.doc2bow(texts[i])]
-            )
-            population[i].fitness_score = (cossim + 1) / 2 # in range [0, 1]
+            population[i].fitness_score = float(scores[i])
 
     def iterate_population(self, nl_item: NLItemInfo):
+        now = time.perf_counter
+        start = now()
+        # Measured by _get_nls_to_iterate if the population hasn't changed since, consumed so it's never stale
+        adaptive_ratio = self._get_adaptive_ratio(nl_item, self.population_diversities.pop(nl_item, None))
+        number_of_children = max(1, round(self.number_of_children * adaptive_ratio))
+        population_number = max(1, round(self.population_number_per_NL * adaptive_ratio))
         last_population = self.populations[nl_item].copy()
         score_sum = 0
         for item in last_population:
@@ -261,30 +799,197 @@ class CodfrelGeneticAlgorithm:
         population = self.populations[nl_item]
         # 1. Wheel selection, select parents with fitness/fitness_sum as probability
         parents = random.choices(last_population, last_population_selection_weights, k=self.number_of_parents)
-        for i in range(self.number_of_children):
+        selection_end = now()
+        fusion_time = 0.0
+        mutation_time = 0.0
+        additive_mutations = 0
+        removal_mutations = 0
+        removed_lines = 0
+        for i in range(number_of_children):
+            fusion_start = now()
             parents_pair = random.choices(parents, k=2)
             # 2. Fusion
-            child_pl_lines = set(parents_pair[0].pl_lines).union(parents_pair[1].pl_lines)
+            child_line_indices = np.union1d(parents_pair[0].line_indices, parents_pair[1].line_indices)
+            mutation_start = now()
+            fusion_time += mutation_start - fusion_start
             # 3. Mutation
             if random.random() < self.mutation_probability:
                 if random.random() < self.additive_mutation_probability:
-                    child_pl_lines = child_pl_lines.union(set(self._select_new_guided_random_lines(selection_list)))
-                elif len(child_pl_lines) >= 2:
-                    number_of_removed_lines = random.randrange(1, int(len(child_pl_lines) / 2) + 1)
-                    for i in range(number_of_removed_lines):
-                        child_pl_lines.remove(random.choice(list(child_pl_lines)))
+                    child_line_indices = np.union1d(child_line_indices, self._select_new_guided_random_lines(selection_list))
+                    additive_mutations += 1
+                elif len(child_line_indices) >= 2:
+                    number_of_removed_lines = random.randrange(1, int(len(child_line_indices) / 2) + 1)
+                    child_line_indices = np.delete(
+                        child_line_indices, random.sample(range(len(child_line_indices)), number_of_removed_lines)
+                    )
+                    removal_mutations += 1
+                    removed_lines += number_of_removed_lines
             # Final child construction
-            child_pl_lines = list(child_pl_lines)
-            self._sort_item_pl_lines(child_pl_lines)
-            child = PopulationItem(child_pl_lines)
-            population.append(child)
+            population.append(PopulationItem(child_line_indices))
+            mutation_time += now() - mutation_start
         # Remove duplicates
+        dedup_start = now()
+        population_size_with_duplicates = len(population)
         self._remove_population_duplicates(population)
         # Calculate population fitness
+        fitness_start = now()
         self.calculate_population_fitness(nl_item)
         # Sort and trim population
-        self._sort_and_trim_population(nl_item)
+        sort_trim_start = now()
+        fitness_evaluations = len(population)
+        self._sort_and_trim_population(nl_item, population_number)
+        end = now()
         self.iteration_numbers[nl_item] += 1
+        if self.telemetry != None:
+            self.telemetry.add_iteration(
+                nl_item.nl_index,
+                {
+                    "selection": selection_end - start,
+                    "fusion": fusion_time,
+                    "mutation": mutation_time,
+                    "dedup": fitness_start - dedup_start,
+                    "fitness": sort_trim_start - fitness_start,
+                    "sort_trim": end - sort_trim_start,
+                },
+                {
+                    "iterations": 1,
+                    "children": number_of_children,
+                    "additive_mutations": additive_mutations,
+                    "removal_mutations": removal_mutations,
+                    "removed_lines": removed_lines,
+                    "duplicates_removed": population_size_with_duplicates - fitness_evaluations,
+                    "fitness_evaluations": fitness_evaluations,
+                }
+            )
+
+_worker_ga: CodfrelGeneticAlgorithm|None = None
+_worker_stopping_condition = None
+
+def _worker_initialize_populations(shard_index: int, nl_indices: list[int], seed: int):
+    ga = _worker_ga
+    random.seed(seed)
+    nl_items = [ga.nl_items[nl_index] for nl_index in nl_indices]
+    for nl in nl_items:
+        ga.initialize_population(nl)
+    return ga._export_populations(nl_items)
+
+def _worker_initialize_island(nl_index: int, seed: int):
+    ga = _worker_ga
+    random.seed(seed)
+    nl = ga.nl_items[nl_index]
+    ga.population_number_per_NL = ga.island_population_number_per_NL
+    ga.initialize_population(nl)
+    return _export_population(ga.populations[nl])
+
+def _worker_iterate_island(nl_index: int, island: tuple[list[np.ndarray], list[float]], iterations: int, seed: int):
+    ga = _worker_ga
+    random.seed(seed)
+    nl = ga.nl_items[nl_index]
+    ga.population_number_per_NL = ga.island_population_number_per_NL
+    ga.populations[nl] = _import_population(island)
+    # Measured on the merged population, not this island
+    ga.population_diversities.pop(nl, None)
+    if ga.telemetry != None:
+        ga.telemetry = codfrel_telemetry.GATelemetry()
+    completed_iterations = 0
+    interrupted = False
+    try:
+        for i in range(iterations):
+            ga.iterate_population(nl)
+            completed_iterations += 1
+    except KeyboardInterrupt:
+        ga._remove_population_duplicates(ga.populations[nl])
+        ga.calculate_population_fitness(nl)
+        ga._sort_and_trim_population(nl)
+        interrupted = True
+    telemetry_totals = ga.telemetry.get_totals() if ga.telemetry != None else None
+    return _export_population(ga.populations[nl]), completed_iterations, interrupted, telemetry_totals
+
+def _worker_run(shard_index: int, nl_indices: list[int], seed: int):
+    ga = _worker_ga
+    random.seed(seed)
+    if shard_index != 0:
+        # Only the first shard reports progress
+        sys.stdout = open(os.devnull, "w")
+    # The stopping conditions are evaluated per NL of the shard, as if it was the whole GA
+    ga.nl_items = [ga.nl_items[nl_index] for nl_index in nl_indices]
+    ga.workers = 1
+    if ga.checkpoint_path != None:
+        ga.checkpoint_path += CHECKPOINT_SHARD_SUFFIX + str(shard_index)
+        if os.path.isfile(ga.checkpoint_path):
+            checkpoint = load_checkpoint(ga.checkpoint_path)
+            if checkpoint != None and checkpoint["ga_state"]["nl_indices"] == nl_indices:
+                ga.set_state(checkpoint["ga_state"])
+    telemetry_totals = None
+    if ga.telemetry != None:
+        # Every worker traces its own global iterations
+        ga.telemetry = codfrel_telemetry.GATelemetry(
+            ga.telemetry.trace_path + TELEMETRY_SHARD_SUFFIX + str(shard_index) if ga.telemetry.trace_path != None else None
+        )
+    ga.run(_worker_stopping_condition)
+    if ga.telemetry != None:
+        ga.telemetry.close()
+        telemetry_totals = ga.telemetry.get_totals()
+    iteration_numbers = {nl.nl_index: ga.iteration_numbers[nl] for nl in ga.nl_items}
+    return (
+        ga.global_iteration_number, iteration_numbers, ga.interrupted_via_keyboard_interrupt,
+        ga._export_populations(ga.nl_items), telemetry_totals
+    )
+
+DATASET_CHUNK_LINES = 4096 # Lines per task when the rows are parsed and transformed in worker processes
+
+def open_jsonl_file(jsonl_file_path: str):
+    # Text mode, decompressed on the fly for .gz and .zst files
+    if jsonl_file_path.endswith(".gz"):
+        return gzip.open(jsonl_file_path, "rt")
+    if jsonl_file_path.endswith(".zst") or jsonl_file_path.endswith(".zstd"):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Reading " + jsonl_file_path + " requires the zstandard package.")
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(jsonl_file_path, "rb"), closefd=True))
+    return open(jsonl_file_path)
+
+# Set while the Dataset worker processes are forked, so that the transform functions don't have to be pickled.
+_worker_row_transform_funcs = None
+
+def _transform_rows(lines: list[str], nl_transform_func, pl_transform_func) -> list[tuple[str|None, str|None]]:
+    rows = []
+    for line in lines:
+        json_obj = _json_loads(line)
+        rows.append((nl_transform_func(json_obj), pl_transform_func(json_obj)))
+    return rows
+
+def _worker_transform_rows(lines: list[str]) -> list[tuple[str|None, str|None]]:
+    return _transform_rows(lines, *_worker_row_transform_funcs)
+
+def _iterate_transformed_rows(file, nl_transform_func, pl_transform_func, workers: int):
+    # Yields (nl, pl) of every line in order. With workers, chunks of lines are parsed and transformed in worker
+    # processes, at most two chunks per worker ahead of the consumer, so closing the generator stops reading.
+    if workers <= 1:
+        for line in file:
+            json_obj = _json_loads(line)
+            yield nl_transform_func(json_obj), pl_transform_func(json_obj)
+        return
+    global _worker_row_transform_funcs
+    _worker_row_transform_funcs = (nl_transform_func, pl_transform_func)
+    try:
+        with concurrent.futures.ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork")) as executor:
+            pending = collections.deque()
+            try:
+                while True:
+                    lines = list(itertools.islice(file, DATASET_CHUNK_LINES))
+                    if len(lines) != 0:
+                        pending.append(executor.submit(_worker_transform_rows, lines))
+                    if len(pending) == 0:
+                        break
+                    if len(lines) == 0 or len(pending) >= 2 * workers:
+                        yield from pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
+    finally:
+        _worker_row_transform_funcs = None
 
 class Dataset:
     def __init__(self,
@@ -293,94 +998,157 @@ class Dataset:
                  pl_transform_func,
                  max_nl_count: int|None = None,
                  max_pl_count: int|None = None,
-                 max_link_count: int|None = None):
+                 max_link_count: int|None = None,
+                 workers: int = 1):
         self.nl_items: list[str] = []
         self.pl_items: list[str] = []
         self.nl_to_pl_links: dict[int, set[int]] = {}
         self.links_count = 0
-        lines = []
-        with open(jsonl_file_path) as file:
-            lines = file.readlines()
         nl_to_id = {}
         pl_to_id = {}
-        for line in lines:
-            # Check link count
-            if max_link_count != None and self.links_count >= max_link_count:
-                break
-            # Load strs from the row
-            json_obj = json.loads(line)
-            nl = nl_transform_func(json_obj)
-            pl = pl_transform_func(json_obj)
-            if nl == None or pl == None:
-                continue
-            # Check nl/pl counts
-            if nl not in nl_to_id:
-                if max_nl_count != None and len(self.nl_items) >= max_nl_count:
-                    continue
-            if pl not in pl_to_id:
-                if max_pl_count != None and len(self.pl_items) >= max_pl_count:
-                    continue
-            # Determine indices (find or add)
-            if nl in nl_to_id:
-                nl_index = nl_to_id[nl]
-            else:
-                nl_index = len(self.nl_items)
-                self.nl_items.append(nl)
-                nl_to_id[nl] = nl_index
-            if pl in pl_to_id:
-                pl_index = pl_to_id[pl]
-            else:
-                pl_index = len(self.pl_items)
-                self.pl_items.append(pl)
-                pl_to_id[pl] = pl_index
-            # Add link
-            if nl_index not in self.nl_to_pl_links:
-                self.nl_to_pl_links[nl_index] = set()
-            self.nl_to_pl_links[nl_index].add(pl_index)
-            self.links_count += 1
+        # The file is read lazily, nothing after the link count limit is read or parsed
+        with open_jsonl_file(jsonl_file_path) as file:
+            rows = _iterate_transformed_rows(file, nl_transform_func, pl_transform_func, workers)
+            try:
+                for nl, pl in rows:
+                    # Check link count
+                    if max_link_count != None and self.links_count >= max_link_count:
+                        break
+                    if nl == None or pl == None:
+                        continue
+                    # Check nl/pl counts
+                    if nl not in nl_to_id:
+                        if max_nl_count != None and len(self.nl_items) >= max_nl_count:
+                            continue
+                    if pl not in pl_to_id:
+                        if max_pl_count != None and len(self.pl_items) >= max_pl_count:
+                            continue
+                    # Determine indices (find or add)
+                    if nl in nl_to_id:
+                        nl_index = nl_to_id[nl]
+                    else:
+                        nl_index = len(self.nl_items)
+                        self.nl_items.append(nl)
+                        nl_to_id[nl] = nl_index
+                    if pl in pl_to_id:
+                        pl_index = pl_to_id[pl]
+                    else:
+                        pl_index = len(self.pl_items)
+                        self.pl_items.append(pl)
+                        pl_to_id[pl] = pl_index
+                    # Add link
+                    if nl_index not in self.nl_to_pl_links:
+                        self.nl_to_pl_links[nl_index] = set()
+                    self.nl_to_pl_links[nl_index].add(pl_index)
+                    self.links_count += 1
+            finally:
+                rows.close()
 
     def are_linked(self, nl_index: int, pl_index: int):
         return pl_index in self.nl_to_pl_links[nl_index]
 
-class EvalMetrics:
-    def __init__(self, rows: list[tuple[int, int, bool, bool, float, int, int]]):
-        self.rows = rows
+def calculate_precision_recall_f1_f2(tp: int, fp: int, fn: int) -> tuple[float|None, float|None, float|None, float|None]:
+    if (tp + fp) == 0:
+        precision = None
+    else:
+        precision = tp / (tp + fp)
 
-        self.tp = len([item for item in rows if item[2] and item[3]])
-        self.fp = len([item for item in rows if not item[2] and item[3]])
-        self.tn = len([item for item in rows if not item[2] and not item[3]])
-        self.fn = len([item for item in rows if item[2] and not item[3]])
+    if (tp + fn) == 0:
+        recall = None
+    else:
+        recall = tp / (tp + fn)
 
-        if (self.tp + self.fp) == 0:
-            self.precision = None
-        else:
-            self.precision = self.tp / (self.tp + self.fp)
+    if precision == None or recall == None or (precision + recall) == 0:
+        f1 = None
+        f2 = None
+    else:
+        f1 = 2 * ((precision * recall) / (precision + recall))
+        f2 = (1 + 2 * 2) * ((precision * recall) / (2 * 2 * (precision + recall)))
 
-        if (self.tp + self.fn) == 0:
-            self.recall = None
-        else:
-            self.recall = self.tp / (self.tp + self.fn)
+    return precision, recall, f1, f2
 
-        if self.precision == None or self.recall == None or (self.precision + self.recall) == 0:
-            self.f1 = None
-            self.f2 = None
+EVAL_ROWS_COLUMNS = [
+    "nl_index", "pl_index", "label", "prediction", "prediction_max_fitness_score", "pl_pred_lines", "pl_total_lines"
+]
+EVAL_ROWS_FORMATS = ["csv", "npz", "parquet"]
+EVAL_ROWS_CHUNK_SIZE = 1 << 16 # Rows per write
+
+def write_eval_rows(path: str, row_columns_iterator, rows_format: str = "csv"):
+    # Writes the rows given as chunks of columns (lists of arrays in EVAL_ROWS_COLUMNS order), without building
+    # the whole table as text. The chunks are merged up to EVAL_ROWS_CHUNK_SIZE rows per write (Parquet row group).
+    def iterate_merged_chunks():
+        pending = []
+        pending_rows = 0
+        for columns in row_columns_iterator:
+            pending.append(columns)
+            pending_rows += len(columns[0])
+            if pending_rows >= EVAL_ROWS_CHUNK_SIZE:
+                yield [np.concatenate(column_chunks) for column_chunks in zip(*pending)]
+                pending = []
+                pending_rows = 0
+        if len(pending) != 0:
+            yield [np.concatenate(column_chunks) for column_chunks in zip(*pending)]
+    if rows_format == "csv":
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            writer = csv.writer(file, lineterminator='\n')
+            writer.writerow(EVAL_ROWS_COLUMNS)
+            for columns in iterate_merged_chunks():
+                # Booleans as 0/1
+                writer.writerows(zip(*[
+                    (column.astype(np.int8) if column.dtype == np.bool_ else column).tolist() for column in columns
+                ]))
+    elif rows_format == "npz":
+        chunks = list(iterate_merged_chunks())
+        np.savez_compressed(path, **{
+            name: np.concatenate([chunk[column_i] for chunk in chunks]) if len(chunks) != 0 else np.zeros(0)
+            for column_i, name in enumerate(EVAL_ROWS_COLUMNS)
+        })
+    elif rows_format == "parquet":
+        import pyarrow
+        import pyarrow.parquet
+        writer = None
+        try:
+            for columns in iterate_merged_chunks():
+                table = pyarrow.Table.from_arrays([pyarrow.array(column) for column in columns], names=EVAL_ROWS_COLUMNS)
+                if writer == None:
+                    writer = pyarrow.parquet.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer != None:
+                writer.close()
+    else:
+        raise ValueError("Unknown rows format: " + rows_format)
+
+class EvalMetrics:
+    def __init__(self,
+                 rows: list[tuple[int, int, bool, bool, float, int, int]],
+                 counts: tuple[int, int, int, int]|None = None,
+                 nl_count: int|None = None):
+        # If the rows are sparse (e.g. only the PL items in the populations), counts (tp, fp, tn, fn)
+        # and nl_count (for MAP) must be given, they can't be counted from the rows.
+        self.rows = rows
+        self.nl_count = nl_count
+
+        if counts != None:
+            self.tp, self.fp, self.tn, self.fn = counts
         else:
-            self.f1 = 2 * ((self.precision * self.recall) / (self.precision + self.recall))
-            self.f2 = (1 + 2 * 2) * ((self.precision * self.recall) / (2 * 2 * (self.precision + self.recall)))
+            self.tp = len([item for item in rows if item[2] and item[3]])
+            self.fp = len([item for item in rows if not item[2] and item[3]])
+            self.tn = len([item for item in rows if not item[2] and not item[3]])
+            self.fn = len([item for item in rows if item[2] and not item[3]])
+
+        self.precision, self.recall, self.f1, self.f2 = calculate_precision_recall_f1_f2(self.tp, self.fp, self.fn)
 
         self.map_at: dict[int, float] = {}
 
     def get_rows_csv(self):
-        text = "nl_index,pl_index,label,prediction,prediction_max_fitness_score,pl_pred_lines,pl_total_lines"
-        for row in self.rows:
-            text += '\n' + str(row[0]) \
-                  + ',' + str(row[1]) \
-                  + ',' + str(1 if row[2] else 0) \
-                  + ',' + str(1 if row[3] else 0) \
-                  + ',' + str(row[4]) \
-                  + ',' + str(row[5]) \
-                  + ',' + str(row[6])
-        return text
+        output = io.StringIO()
+        writer = csv.writer(output, lineterminator='\n')
+        writer.writerow(EVAL_ROWS_COLUMNS)
+        writer.writerows(
+            (row[0], row[1], 1 if row[2] else 0, 1 if row[3] else 0, row[4], row[5], row[6]) for row in self.rows
+        )
+        return output.getvalue()
 
     def calculate_map_metrics(self):
         if len(self.map_at) == 0:
@@ -426,8 +1194,10 @@ class EvalMetrics:
                         ap_at[i] = ap_sum / relevant_count
                     ap_sum_at[i] += ap_at[i]
             self.map_at: dict[int, float] = {}
+            # Without rows, an NL item counts with AP 0
+            nl_count = self.nl_count if self.nl_count != None else len(nl_to_pl)
             for i in range(1, AT_STOP):
-                self.map_at[i] = ap_sum_at[i] / len(nl_to_pl)
+                self.map_at[i] = ap_sum_at[i] / nl_count
 
     def __str__(self):
         self.calculate_map_metrics()
@@ -456,10 +1226,10 @@ class EvalMAPMetricsFromPopulation:
             top_pl_indices = []
             top_pl_indices_set = set()
             for item in population:
-                for line in item.pl_lines:
-                    if line.pl_index not in top_pl_indices_set:
-                        top_pl_indices.append(line.pl_index)
-                        top_pl_indices_set.add(line.pl_index)
+                for pl_index in ga.pl_line_pl_indices[item.line_indices].tolist():
+                    if pl_index not in top_pl_indices_set:
+                        top_pl_indices.append(pl_index)
+                        top_pl_indices_set.add(pl_index)
                     if len(top_pl_indices) >= AT_STOP - 1:
                         break
                 if len(top_pl_indices) >= AT_STOP - 1:
@@ -493,6 +1263,160 @@ class EvalMAPMetricsFromPopulation:
             output_dict["MAP@" + str(i)] = self.map_at[i]
         return str(output_dict)
 
+# Evaluates every (min_fitness, min_lines_ratio) config at once.
+# A PL item is predicted for an NL item if more than min_lines_ratio of its lines are in the population items
+# with a fitness score > min_fitness. So a line counts for all min_fitness values below the max fitness score
+# of the items containing it, and the per-line max scores are enough to count the predicted lines
+# for every min_fitness value. Rows are only built for the configs that are asked for.
+class EvalConfigSweep:
+    def __init__(self, ga: CodfrelGeneticAlgorithm, dataset: Dataset, min_fitness_values: list[float], min_lines_ratio_values: list[float]):
+        # Both sorted ascending
+        self.dataset = dataset
+        self.min_fitness_values = min_fitness_values
+        self.min_lines_ratio_values = min_lines_ratio_values
+        min_fitness_array = np.array(min_fitness_values, dtype=np.float64)
+        min_lines_ratio_array = np.array(min_lines_ratio_values, dtype=np.float64)
+        fitness_steps = len(min_fitness_values)
+        ratio_steps = len(min_lines_ratio_values)
+        # Per NL, (PL, line) info of the PL items that are in the population
+        self.nl_pair_pl_indices: list[np.ndarray] = []
+        self.nl_pair_max_fitness_scores: list[np.ndarray] = []
+        self.nl_pair_total_lines: list[np.ndarray] = []
+        self.nl_line_pair_positions: list[np.ndarray] = []
+        self.nl_line_max_fitness_scores: list[np.ndarray] = []
+        # [min_fitness_i, number of min_lines_ratio values below the ratio], summed over all (NL, PL) pairs
+        predicted_counts = np.zeros(fitness_steps * (ratio_steps + 1), dtype=np.int64)
+        predicted_positive_counts = np.zeros(fitness_steps * (ratio_steps + 1), dtype=np.int64)
+        self.positives_count = 0
+        for nl_i in range(len(dataset.nl_items)):
+            population = ga.populations[ga.nl_items[nl_i]]
+            self.positives_count += len(dataset.nl_to_pl_links[nl_i])
+            if len(population) != 0:
+                lines = np.concatenate([item.line_indices for item in population])
+                fitness_scores = np.repeat(
+                    np.array([item.fitness_score for item in population], dtype=np.float64),
+                    [len(item.line_indices) for item in population]
+                )
+            else:
+                lines = np.zeros(0, dtype=np.int32)
+                fitness_scores = np.zeros(0, dtype=np.float64)
+            unique_lines, line_positions = np.unique(lines, return_inverse=True)
+            line_max_fitness_scores = np.full(len(unique_lines), -np.inf)
+            np.maximum.at(line_max_fitness_scores, line_positions, fitness_scores)
+            pair_pl_indices, line_pair_positions = np.unique(ga.pl_line_pl_indices[unique_lines], return_inverse=True)
+            pair_max_fitness_scores = np.full(len(pair_pl_indices), -np.inf)
+            np.maximum.at(pair_max_fitness_scores, line_pair_positions, line_max_fitness_scores)
+            pair_total_lines = np.zeros(len(pair_pl_indices), dtype=np.int64)
+            pair_total_lines[line_pair_positions] = ga.pl_line_pl_item_total_lines[unique_lines]
+            pair_labels = np.isin(pair_pl_indices, list(dataset.nl_to_pl_links[nl_i]))
+            self.nl_pair_pl_indices.append(pair_pl_indices)
+            self.nl_pair_max_fitness_scores.append(pair_max_fitness_scores)
+            self.nl_pair_total_lines.append(pair_total_lines)
+            self.nl_line_pair_positions.append(line_pair_positions)
+            self.nl_line_max_fitness_scores.append(line_max_fitness_scores)
+            # The lines count for min_fitness_i < line_fitness_steps (the number of min_fitness values below their score)
+            line_fitness_steps = np.searchsorted(min_fitness_array, line_max_fitness_scores, side="left")
+            line_counts = np.zeros((len(pair_pl_indices), fitness_steps + 1), dtype=np.int64)
+            np.add.at(line_counts, (line_pair_positions, line_fitness_steps), 1)
+            pred_lines = np.cumsum(line_counts[:, ::-1], axis=1)[:, ::-1][:, 1:] # [pair, min_fitness_i]
+            # The pairs are predicted for min_lines_ratio_i < pair_ratio_steps
+            pair_ratio_steps = np.searchsorted(min_lines_ratio_array, pred_lines / pair_total_lines[:, None], side="left")
+            config_positions = (np.arange(fitness_steps) * (ratio_steps + 1))[None, :] + pair_ratio_steps
+            predicted_counts += np.bincount(config_positions.ravel(), minlength=len(predicted_counts))
+            predicted_positive_counts += np.bincount(config_positions[pair_labels].ravel(), minlength=len(predicted_counts))
+        def predicted_for_each_ratio(counts: np.ndarray) -> np.ndarray:
+            counts = counts.reshape(fitness_steps, ratio_steps + 1)
+            return np.cumsum(counts[:, ::-1], axis=1)[:, ::-1][:, 1:] # [min_fitness_i, min_lines_ratio_i]
+        self.tp = predicted_for_each_ratio(predicted_positive_counts)
+        self.fp = predicted_for_each_ratio(predicted_counts) - self.tp
+        self.fn = self.positives_count - self.tp
+        self.tn = len(dataset.nl_items) * len(dataset.pl_items) - self.tp - self.fp - self.fn
+
+    def get_config_str(self, min_fitness_i: int, min_lines_ratio_i: int) -> str:
+        return "min_fitness=" + str(self.min_fitness_values[min_fitness_i]) \
+             + ",min_lines_ratio=" + str(self.min_lines_ratio_values[min_lines_ratio_i])
+
+    def get_f1(self, min_fitness_i: int, min_lines_ratio_i: int) -> float|None:
+        return calculate_precision_recall_f1_f2(
+            int(self.tp[min_fitness_i, min_lines_ratio_i]),
+            int(self.fp[min_fitness_i, min_lines_ratio_i]),
+            int(self.fn[min_fitness_i, min_lines_ratio_i])
+        )[2]
+
+    def get_best_f1_config(self, min_lines_ratio_i: int|None = None) -> tuple[int, int]|None:
+        # The first config with the maximum F1, optionally with a fixed min_lines_ratio
+        max_f1 = -1
+        max_f1_config = None
+        for min_fitness_i in range(len(self.min_fitness_values)):
+            for ratio_i in range(len(self.min_lines_ratio_values)):
+                if min_lines_ratio_i != None and ratio_i != min_lines_ratio_i:
+                    continue
+                f1 = self.get_f1(min_fitness_i, ratio_i)
+                if f1 != None and f1 > max_f1:
+                    max_f1 = f1
+                    max_f1_config = (min_fitness_i, ratio_i)
+        return max_f1_config
+
+    def iterate_row_columns(self, min_fitness_i: int, min_lines_ratio_i: int, sparse: bool = False):
+        # Yields the rows of each NL item as columns, in EVAL_ROWS_COLUMNS order.
+        # All NL x PL rows, or if sparse, only the rows of the PL items in the population (nonzero prediction_max_fitness_score).
+        min_fitness = self.min_fitness_values[min_fitness_i]
+        min_lines_ratio = self.min_lines_ratio_values[min_lines_ratio_i]
+        pl_count = len(self.dataset.pl_items)
+        for nl_i in range(len(self.dataset.nl_items)):
+            pair_pl_indices = self.nl_pair_pl_indices[nl_i]
+            pair_pred_lines = np.bincount(
+                self.nl_line_pair_positions[nl_i][self.nl_line_max_fitness_scores[nl_i] > min_fitness],
+                minlength=len(pair_pl_indices)
+            )
+            pair_total_lines = self.nl_pair_total_lines[nl_i]
+            pair_preds = pair_pred_lines / pair_total_lines > min_lines_ratio
+            linked_pl_indices = np.array(list(self.dataset.nl_to_pl_links[nl_i]), dtype=np.int64)
+            if sparse:
+                yield [
+                    np.full(len(pair_pl_indices), nl_i, dtype=np.int64),
+                    pair_pl_indices.astype(np.int64),
+                    np.isin(pair_pl_indices, linked_pl_indices),
+                    pair_preds,
+                    self.nl_pair_max_fitness_scores[nl_i],
+                    pair_pred_lines.astype(np.int64),
+                    pair_total_lines,
+                ]
+                continue
+            labels = np.zeros(pl_count, dtype=np.bool_)
+            labels[linked_pl_indices] = True
+            preds = np.zeros(pl_count, dtype=np.bool_)
+            preds[pair_pl_indices] = pair_preds
+            pred_values = np.zeros(pl_count, dtype=np.float64)
+            pred_values[pair_pl_indices] = self.nl_pair_max_fitness_scores[nl_i]
+            pred_lines = np.zeros(pl_count, dtype=np.int64)
+            pred_lines[pair_pl_indices] = pair_pred_lines
+            total_lines = np.zeros(pl_count, dtype=np.int64)
+            total_lines[pair_pl_indices] = pair_total_lines
+            yield [np.full(pl_count, nl_i, dtype=np.int64), np.arange(pl_count, dtype=np.int64), labels, preds, pred_values, pred_lines, total_lines]
+
+    def get_rows(self, min_fitness_i: int, min_lines_ratio_i: int, sparse: bool = False) -> list[tuple[int, int, bool, bool, float, int, int]]:
+        rows: list[tuple[int, int, bool, bool, float, int, int]] = []
+        for columns in self.iterate_row_columns(min_fitness_i, min_lines_ratio_i, sparse):
+            rows.extend(zip(*[column.tolist() for column in columns]))
+        return rows
+
+    def write_rows(self, path: str, min_fitness_i: int, min_lines_ratio_i: int, rows_format: str = "csv", sparse: bool = False):
+        write_eval_rows(path, self.iterate_row_columns(min_fitness_i, min_lines_ratio_i, sparse), rows_format)
+
+    def get_metrics(self, min_fitness_i: int, min_lines_ratio_i: int) -> EvalMetrics:
+        # From the sparse rows, the rows of the PL items that aren't in the population don't change the MAP
+        return EvalMetrics(
+            self.get_rows(min_fitness_i, min_lines_ratio_i, sparse=True),
+            counts=(
+                int(self.tp[min_fitness_i, min_lines_ratio_i]),
+                int(self.fp[min_fitness_i, min_lines_ratio_i]),
+                int(self.tn[min_fitness_i, min_lines_ratio_i]),
+                int(self.fn[min_fitness_i, min_lines_ratio_i])
+            ),
+            nl_count=len(self.dataset.nl_items)
+        )
+
 def number_to_vertical_box_drawing_bar(number):
     if number <= 0:
         return ' '
@@ -534,6 +1458,44 @@ def number_to_horizontal_box_drawing_bar(number):
         return '█'
 
 CODFREL_EVAL_DIR = "codfrel_eval"
+MINIMUM_MIN_FITNESS = 0.5
+MIN_FITNESS_STEPS = 500
+MIN_LINES_RATIO_STEPS = 20
+CODFREL_EVAL_PREPROCESSED_DIR = "preprocessed" # Inside CODFREL_EVAL_DIR, preprocessed corpora by fingerprint
+
+def get_eval_config_values() -> tuple[list[float], list[float]]:
+    min_fitness_values = [
+        0.5 + (min_fitness_i / MIN_FITNESS_STEPS) * (1 - MINIMUM_MIN_FITNESS) # [MINIMUM_MIN_FITNESS, 1)
+        for min_fitness_i in range(MIN_FITNESS_STEPS)
+    ]
+    min_lines_ratio_values = [
+        min_lines_ratio_i / MIN_LINES_RATIO_STEPS # [0, 1)
+        for min_lines_ratio_i in range(MIN_LINES_RATIO_STEPS)
+    ]
+    return min_fitness_values, min_lines_ratio_values
+
+def get_cached_preprocessed_corpus(preprocessed_dir: str,
+                                   dataset: Dataset,
+                                   jsonl_file_path: str,
+                                   dataset_type: str,
+                                   max_links_count: int|None,
+                                   max_nl_count: int|None,
+                                   max_pl_count: int|None,
+                                   workers: int = 1) -> PreprocessedCorpus:
+    preprocessed_corpus_path = os.path.join(
+        preprocessed_dir,
+        get_preprocessed_corpus_fingerprint(jsonl_file_path, dataset_type, max_links_count, max_nl_count, max_pl_count) + ".npz"
+    )
+    preprocessed_corpus = None
+    if os.path.isfile(preprocessed_corpus_path):
+        print("Loading preprocessed corpus: " + preprocessed_corpus_path)
+        preprocessed_corpus = PreprocessedCorpus.load(preprocessed_corpus_path)
+    if preprocessed_corpus == None:
+        preprocessed_corpus = PreprocessedCorpus.preprocess(dataset.nl_items, dataset.pl_items, workers)
+        preprocessed_corpus.save(preprocessed_corpus_path)
+        print("Saved preprocessed corpus: " + preprocessed_corpus_path)
+    return preprocessed_corpus
+
 def codfrel_eval(name: str,
                  jsonl_file_path: str,
                  dataset_type: str,
@@ -543,7 +1505,20 @@ def codfrel_eval(name: str,
                  number_of_parents: int = 7,
                  number_of_children: int = 21,
                  max_nl_count: int|None = None,
-                 max_pl_count: int|None = None):
+                 max_pl_count: int|None = None,
+                 fitness_mode: str = "population-lsi",
+                 workers: int = 1,
+                 seed: int|None = None,
+                 checkpoint_interval: float|None = None,
+                 checkpoint_metadata: dict|None = None,
+                 resume_checkpoint: dict|None = None,
+                 telemetry: bool = False,
+                 islands: int = 1,
+                 migration_interval: int = 10,
+                 migrants_count: int = 2,
+                 adaptive_population: bool = False,
+                 rows_format: str = "csv",
+                 sparse_rows: bool = False):
     if max_links_count != None and max_links_count <= 0:
         max_links_count = None
     if max_nl_count != None and max_nl_count <= 0:
@@ -558,11 +1533,31 @@ def codfrel_eval(name: str,
         print("No dataset type found: " + dataset_type)
         print("Defined dataset types: " + ', '.join([key for key in codfrel_row_transform_functions.nl_transforms]))
         return
+    if fitness_mode not in FITNESS_MODES:
+        print("No fitness mode found: " + fitness_mode)
+        print("Defined fitness modes: " + ', '.join(FITNESS_MODES))
+        return
+    if islands < 1 or migration_interval < 1:
+        print("The number of islands and the migration interval must be at least 1.")
+        return
+    if rows_format not in EVAL_ROWS_FORMATS:
+        print("No rows format found: " + rows_format)
+        print("Defined rows formats: " + ', '.join(EVAL_ROWS_FORMATS))
+        return
+    if rows_format == "parquet" and importlib.util.find_spec("pyarrow") == None:
+        print("The parquet rows format requires the pyarrow package.")
+        return
     if not os.path.exists(CODFREL_EVAL_DIR):
         os.mkdir(CODFREL_EVAL_DIR)
     elif not os.path.isdir(CODFREL_EVAL_DIR):
         print(CODFREL_EVAL_DIR + " exists, but is not a directory.")
         return
+    preprocessed_dir = os.path.join(CODFREL_EVAL_DIR, CODFREL_EVAL_PREPROCESSED_DIR)
+    if not os.path.exists(preprocessed_dir):
+        os.mkdir(preprocessed_dir)
+    elif not os.path.isdir(preprocessed_dir):
+        print(preprocessed_dir + " exists, but is not a directory.")
+        return
     results_dir = os.path.join(CODFREL_EVAL_DIR, name)
     if not os.path.exists(results_dir):
         os.mkdir(results_dir)
@@ -579,6 +1574,19 @@ def codfrel_eval(name: str,
     print("GA population per NL item: " + str(population_number_per_NL))
     print("Number of parents per iteration: " + str(number_of_parents))
     print("Number of children per iteration: " + str(number_of_children))
+    print("Fitness mode: " + fitness_mode)
+    print("Workers: " + str(workers))
+    print("Seed: " + str(seed))
+    print("Checkpoint interval: " + str(checkpoint_interval))
+    print("Telemetry: " + str(telemetry))
+    print("Islands: " + str(islands))
+    if islands > 1:
+        print("Migration interval: " + str(migration_interval))
+        print("Migrants count: " + str(migrants_count))
+    print("Adaptive population: " + str(adaptive_population))
+    print("Rows format: " + rows_format + (" (sparse)" if sparse_rows else ""))
+    if seed != None:
+        random.seed(seed)
     # Transform funcs
     nl_transform = codfrel_row_transform_functions.nl_transforms[dataset_type]
     pl_transform = codfrel_row_transform_functions.pl_transforms[dataset_type]
@@ -599,12 +1607,20 @@ def codfrel_eval(name: str,
         pl_transform_func=pl_transform,
         max_link_count=max_links_count,
         max_nl_count=max_nl_count,
-        max_pl_count=max_pl_count
+        max_pl_count=max_pl_count,
+        workers=workers
     )
     report_time("Loading dataset")
     print("NL count: " + str(len(dataset.nl_items)))
     print("PL count: " + str(len(dataset.pl_items)))
     print("Links count: " + str(dataset.links_count))
+    # Preprocessing
+    print("Preprocessing...")
+    start_time()
+    preprocessed_corpus = get_cached_preprocessed_corpus(
+        preprocessed_dir, dataset, jsonl_file_path, dataset_type, max_links_count, max_nl_count, max_pl_count, workers
+    )
+    report_time("Preprocessing")
     # GA
     print("Initializing GA...")
     start_time()
@@ -613,14 +1629,39 @@ def codfrel_eval(name: str,
         dataset.pl_items,
         population_number_per_NL,
         number_of_parents=number_of_parents,
-        number_of_children=number_of_children
+        number_of_children=number_of_children,
+        fitness_mode=fitness_mode,
+        workers=workers,
+        preprocessed_corpus=preprocessed_corpus,
+        state=resume_checkpoint["ga_state"] if resume_checkpoint != None else None,
+        islands=islands,
+        migration_interval=migration_interval,
+        migrants_count=migrants_count,
+        adaptive_population=adaptive_population
     )
+    if checkpoint_interval != None:
+        ga.enable_checkpoints(
+            os.path.join(results_dir, CHECKPOINT_FILE_NAME),
+            checkpoint_interval,
+            checkpoint_metadata if checkpoint_metadata != None else {}
+        )
+        if resume_checkpoint == None:
+            ga.write_checkpoint()
+    if telemetry:
+        ga.telemetry = codfrel_telemetry.GATelemetry(os.path.join(results_dir, TELEMETRY_FILE_NAME))
     report_time("Initializing GA")
-    print("Running GA...")
-    start_time()
-    ga.run(stopping_condition)
-    print()
-    report_time("Running GA")
+    if resume_checkpoint != None and resume_checkpoint["run_finished"]:
+        print("GA run was already finished.")
+    else:
+        print("Running GA...")
+        start_time()
+        ga.run(stopping_condition)
+        print()
+        report_time("Running GA")
+        if ga.telemetry != None:
+            ga.telemetry.close()
+            print("Time per GA phase:")
+            print(ga.telemetry.get_summary_str())
     # Eval
     print("Evaluating...")
     start_time()
@@ -629,72 +1670,19 @@ def codfrel_eval(name: str,
     print("MAP calculated directly from population:")
     print(map_metrics_from_population)
     start_time()
-    config_to_metrics: dict[str, EvalMetrics] = {}
-    config_str_to_numbers: dict[str, tuple[float, float]] = {}
-    MINIMUM_MIN_FITNESS = 0.5
-    MIN_FITNESS_STEPS = 500
-    MIN_LINES_RATIO_STEPS = 20
-    for min_fitness_i in range(MIN_FITNESS_STEPS):
-        print(".", end="", flush=True)
-        min_fitness = 0.5 + (min_fitness_i / MIN_FITNESS_STEPS) * (1 - MINIMUM_MIN_FITNESS) # [MINIMUM_MIN_FITNESS, 1)
-        #                          dict[nl,  dict[pl,  tuple[set[lines], total_lines_count]]]
-        ga_nl_to_pl_to_lines_info: dict[int, dict[int, tuple[set[int], set[float], int]]] = {}
-        for nl_i in range(len(dataset.nl_items)):
-            ga_nl_to_pl_to_lines_info[nl_i] = {}
-            for item in ga.populations[ga.nl_items[nl_i]]:
-                for line in item.pl_lines:
-                    if line.pl_index not in ga_nl_to_pl_to_lines_info[nl_i]:
-                        ga_nl_to_pl_to_lines_info[nl_i][line.pl_index] = (set(), set(), line.pl_item_total_lines)
-                    if item.fitness_score > min_fitness:
-                        ga_nl_to_pl_to_lines_info[nl_i][line.pl_index][0].add(line.line_index)
-                    ga_nl_to_pl_to_lines_info[nl_i][line.pl_index][1].add(item.fitness_score)
-        for min_lines_ratio_i in range(MIN_LINES_RATIO_STEPS):
-            min_lines_ratio = min_lines_ratio_i / MIN_LINES_RATIO_STEPS # [0, 1)
-            rows: list[tuple[int, int, bool, bool, float, int, int]] = []
-            for nl_i in range(len(dataset.nl_items)):
-                for pl_i in range(len(dataset.pl_items)):
-                    if pl_i in ga_nl_to_pl_to_lines_info[nl_i]:
-                        pred_lines = len(ga_nl_to_pl_to_lines_info[nl_i][pl_i][0])
-                        total_lines = ga_nl_to_pl_to_lines_info[nl_i][pl_i][2]
-                        pred = pred_lines / total_lines > min_lines_ratio
-                        pred_value = max(ga_nl_to_pl_to_lines_info[nl_i][pl_i][1])
-                    else:
-                        pred_lines = 0
-                        total_lines = 0
-                        pred = False
-                        pred_value = 0.0
-                    rows.append((
-                        nl_i,
-                        pl_i,
-                        dataset.are_linked(nl_i, pl_i),
-                        pred,
-                        pred_value,
-                        pred_lines,
-                        total_lines
-                    ))
-            config = "min_fitness=" + str(min_fitness) + ",min_lines_ratio=" + str(min_lines_ratio)
-            config_to_metrics[config] = EvalMetrics(rows)
-            config_str_to_numbers[config] = (min_fitness, min_lines_ratio)
-    print()
+    min_fitness_values, min_lines_ratio_values = get_eval_config_values()
+    config_sweep = EvalConfigSweep(ga, dataset, min_fitness_values, min_lines_ratio_values)
+    max_f1_config_indices = config_sweep.get_best_f1_config()
+    max_f1_zero_min_lines_ratio_config_indices = config_sweep.get_best_f1_config(min_lines_ratio_i=0)
     report_time("Evaluating different configs")
-    max_f1 = -1
-    max_f1_config = None
-    max_f1_metrics = None
-    max_f1_zero_min_lines_ratio = -1
-    max_f1_zero_min_lines_ratio_config = None
-    max_f1_zero_min_lines_ratio_metrics = None
-    for config in config_to_metrics:
-        if config_to_metrics[config].f1 != None and config_to_metrics[config].f1 > max_f1:
-            max_f1 = config_to_metrics[config].f1
-            max_f1_config = config
-            max_f1_metrics = config_to_metrics[config]
-        if config_str_to_numbers[config][1] == 0:
-            if config_to_metrics[config].f1 != None and config_to_metrics[config].f1 > max_f1_zero_min_lines_ratio:
-                max_f1_zero_min_lines_ratio = config_to_metrics[config].f1
-                max_f1_zero_min_lines_ratio_config = config
-                max_f1_zero_min_lines_ratio_metrics = config_to_metrics[config]
+    max_f1_config = config_sweep.get_config_str(*max_f1_config_indices)
+    max_f1_metrics = config_sweep.get_metrics(*max_f1_config_indices)
+    max_f1_zero_min_lines_ratio_config = config_sweep.get_config_str(*max_f1_zero_min_lines_ratio_config_indices)
+    max_f1_zero_min_lines_ratio_metrics = config_sweep.get_metrics(*max_f1_zero_min_lines_ratio_config_indices)
+    min_conf = config_sweep.get_config_str(0, 0)
+    min_conf_metrics = config_sweep.get_metrics(0, 0)
     #print("Metrics with min requrements:")
-    #print(config_to_metrics["min_fitness=0.5,min_lines_ratio=0.0"])
+    #print(min_conf_metrics)
     #print()
     print("Config with best F1:")
     print(max_f1_config)
@@ -706,13 +1694,16 @@ def codfrel_eval(name: str,
     #print("Metrics with best F1 and 0 min lines ratio:")
     #print(max_f1_zero_min_lines_ratio_metrics)
     print("Writing results...")
-    min_conf = "min_fitness=" + str(MINIMUM_MIN_FITNESS) + ",min_lines_ratio=" + str(0 / MIN_LINES_RATIO_STEPS)
-    with open(os.path.join(results_dir, "best_f1_rows.csv"), "w+", encoding="utf-8") as file:
-        file.write(max_f1_metrics.get_rows_csv())
-    with open(os.path.join(results_dir, "best_f1_0_min_lines_ratio_rows.csv"), "w+", encoding="utf-8") as file:
-        file.write(max_f1_zero_min_lines_ratio_metrics.get_rows_csv())
-    with open(os.path.join(results_dir, "minimum_requirements_rows.csv"), "w+", encoding="utf-8") as file:
-        file.write(config_to_metrics[min_conf].get_rows_csv())
+    config_sweep.write_rows(
+        os.path.join(results_dir, "best_f1_rows." + rows_format), *max_f1_config_indices, rows_format, sparse_rows
+    )
+    config_sweep.write_rows(
+        os.path.join(results_dir, "best_f1_0_min_lines_ratio_rows." + rows_format), *max_f1_zero_min_lines_ratio_config_indices,
+        rows_format, sparse_rows
+    )
+    config_sweep.write_rows(
+        os.path.join(results_dir, "minimum_requirements_rows." + rows_format), 0, 0, rows_format, sparse_rows
+    )
     with open(os.path.join(results_dir, "summary.txt"), "w+", encoding="utf-8") as file:
         text = ""
         if ga.interrupted_via_keyboard_interrupt:
@@ -727,9 +1718,12 @@ def codfrel_eval(name: str,
         text += "Metrics with best F1 and 0 min lines ratio:\n" + str(max_f1_zero_min_lines_ratio_metrics) + '\n'
         text += '\n'
         text += "Config with minimum requirements:\n" + min_conf + '\n'
-        text += "Metrics with minimum requirements:\n" + str(config_to_metrics[min_conf]) + '\n'
+        text += "Metrics with minimum requirements:\n" + str(min_conf_metrics) + '\n'
         text += '\n'
         text += "Execution times:\n" + str(times) + '\n'
+        if ga.telemetry != None:
+            text += '\n'
+            text += "Time per GA phase:\n" + ga.telemetry.get_summary_str() + '\n'
         text += '\n'
         text += "Global iterations:\n" + str(ga.global_iteration_number) + '\n'
         text += "Iterations[nl]:\n{" + ', '.join([str(nl.nl_index) + ": " + str(ga.iteration_numbers[nl]) for nl in ga.iteration_numbers]) + "}" + '\n'
@@ -766,7 +1760,7 @@ def stopping_condition_patience_after_top_items_change(
         ):
     # Test
     #print(nl.nl_index, end=": ")
-    #print([(' '.join([str(line.global_pl_line_index) for line in item.pl_lines]), item.fitness_score) for item in ga.populations[nl]][:5])
+    #print([(' '.join([str(i) for i in item.line_indices.tolist()]), item.fitness_score) for item in ga.populations[nl]][:5])
     if ga.global_iteration_number == 0 and nl_item == ga.nl_items[0]: # Init
         ga.stopping_condition_last_best_items = {}
         ga.stopping_condition_last_best_item_iterations = {}
@@ -783,10 +1777,10 @@ def stopping_condition_patience_after_top_items_change(
         ga.stopping_condition_changed_counter = 0
         ga.stopping_condition_stop_counter = 0
     relative_patience_result = False
-    def pl_lines_to_str(pl_lines: list[PLLineInfo]):
-        return ' '.join([str(line.global_pl_line_index) for line in pl_lines])
+    def line_indices_to_str(line_indices: np.ndarray):
+        return ' '.join([str(i) for i in line_indices.tolist()])
     current_best_items = [
-        pl_lines_to_str(ga.populations[nl_item][i].pl_lines) for i in range(
+        line_indices_to_str(ga.populations[nl_item][i].line_indices) for i in range(
             min(
                 top_items_count + top_items_allowed_shift,
                 len(ga.populations[nl_item])
@@ -809,7 +1803,7 @@ def stopping_condition_patience_after_top_items_change(
         ga.stopping_condition_changed_counter += 1
         # Test
         #print(nl.nl_index, end=": ")
-        #print([(' '.join([str(line.global_pl_line_index) for line in item.pl_lines]), item.fitness_score) for item in ga.populations[nl]][:5])
+        #print([(' '.join([str(i) for i in item.line_indices.tolist()]), item.fitness_score) for item in ga.populations[nl]][:5])
     elif ga.iteration_numbers[nl_item] - ga.stopping_condition_last_best_item_iterations[nl_item] > patience_iterations:
         ga.stopping_condition_stop_counter += 1
         relative_patience_result = True
@@ -822,6 +1816,82 @@ def stopping_condition_patience_after_top_items_change(
         ga.stopping_condition_stop_counter = 0
     return relative_patience_result
 
+def stopping_condition_time_budget_scheduler(
+            ga: CodfrelGeneticAlgorithm,
+            nl_item: NLItemInfo,
+            total_time: float = 1200,
+            patience_iterations: int = 100, # Without improvement, to retire an NL item
+            warmup_iterations: int = 10, # Always iterated at first, to estimate the improvement rate
+            exploration_interval: int = 10, # Global iterations an NL item may be skipped before it's iterated again anyway
+            top_items_count: int = 10,
+            improvement_smoothing: float = 0.3
+        ):
+    # Instead of stopping NL items, this schedules them: in each global iteration, only the NL items with the
+    # higher recent improvement of their top fitness scores get iterated (the better half of them, like in
+    # successive halving). The rest are revisited after exploration_interval global iterations, and the
+    # ones that stopped improving are retired. The whole run stops when total_time is over.
+    if ga.global_iteration_number == 0 and nl_item == ga.nl_items[0]: # Init
+        ga.stopping_condition_start_time = time.time()
+        ga.stopping_condition_last_scores = {}
+        ga.stopping_condition_best_scores = {}
+        ga.stopping_condition_last_iterations = {}
+        ga.stopping_condition_last_improvement_iterations = {}
+        ga.stopping_condition_last_global_iterations = {}
+        ga.stopping_condition_improvement_rates = {}
+        ga.stopping_condition_retired = {}
+        ga.stopping_condition_selected = {}
+        for nl in ga.nl_items:
+            ga.stopping_condition_last_scores[nl] = None
+            ga.stopping_condition_best_scores[nl] = None
+            ga.stopping_condition_last_iterations[nl] = -1
+            ga.stopping_condition_last_improvement_iterations[nl] = 0
+            ga.stopping_condition_last_global_iterations[nl] = 0
+            ga.stopping_condition_improvement_rates[nl] = 0.0
+            ga.stopping_condition_retired[nl] = False
+            ga.stopping_condition_selected[nl] = True
+    if nl_item == ga.nl_items[0]:
+        # Scheduling the global iteration
+        ga.stopping_condition_t = (time.time() - ga.stopping_condition_start_time) / total_time
+        active_nls = []
+        for nl in ga.nl_items:
+            if ga.stopping_condition_retired[nl]:
+                continue
+            iteration_number = ga.iteration_numbers[nl]
+            if iteration_number != ga.stopping_condition_last_iterations[nl]:
+                population = ga.populations[nl]
+                score = sum(item.fitness_score for item in population[:top_items_count]) / max(1, min(top_items_count, len(population)))
+                if ga.stopping_condition_last_scores[nl] != None:
+                    rate = max(0.0, score - ga.stopping_condition_last_scores[nl]) / (iteration_number - ga.stopping_condition_last_iterations[nl])
+                    ga.stopping_condition_improvement_rates[nl] = (
+                        (1 - improvement_smoothing) * ga.stopping_condition_improvement_rates[nl] + improvement_smoothing * rate
+                    )
+                if ga.stopping_condition_best_scores[nl] == None or score > ga.stopping_condition_best_scores[nl]:
+                    ga.stopping_condition_best_scores[nl] = score
+                    ga.stopping_condition_last_improvement_iterations[nl] = iteration_number
+                ga.stopping_condition_last_scores[nl] = score
+                ga.stopping_condition_last_iterations[nl] = iteration_number
+                ga.stopping_condition_last_global_iterations[nl] = ga.global_iteration_number
+            if iteration_number - ga.stopping_condition_last_improvement_iterations[nl] > patience_iterations:
+                ga.stopping_condition_retired[nl] = True
+                ga.stopping_condition_selected[nl] = False
+                continue
+            active_nls.append(nl)
+        active_nls.sort(key=lambda nl: ga.stopping_condition_improvement_rates[nl], reverse=True)
+        selected_count = (len(active_nls) + 1) // 2
+        for i, nl in enumerate(active_nls):
+            ga.stopping_condition_selected[nl] = (
+                i < selected_count
+                or ga.iteration_numbers[nl] < warmup_iterations
+                or ga.global_iteration_number - ga.stopping_condition_last_global_iterations[nl] >= exploration_interval
+            )
+        if ga.stopping_condition_t <= 1:
+            retired_count = sum(1 for nl in ga.nl_items if ga.stopping_condition_retired[nl])
+            print(number_to_vertical_box_drawing_bar(ga.stopping_condition_t), end="", flush=True)
+            print(number_to_horizontal_box_drawing_bar(1 - retired_count / len(ga.nl_items)), end="", flush=True)
+            if ga.global_iteration_number % 40 == 39:
+                print()
+    return ga.stopping_condition_t > 1 or not ga.stopping_condition_selected[nl_item]
+
 stopping_condition_patience_after_top_item_change = lambda ga, nl, p: stopping_condition_patience_after_top_items_change(ga, nl, p, 1)
 stopping_condition_patience_after_top_2items_change = lambda ga, nl, p: stopping_condition_patience_after_top_items_change(ga, nl, p, 2)
 stopping_condition_patience_after_top_3items_change = lambda ga, nl, p: stopping_condition_patience_after_top_items_change(ga, nl, p, 3)
@@ -836,6 +1906,7 @@ stopping_conditions = {
     "patience-after-top-3-item-change": stopping_condition_patience_after_top_3items_change,
     "patience-after-top-4-items-change": stopping_condition_patience_after_top_4items_change,
     "patience-after-top-5-items-change": stopping_condition_patience_after_top_5items_change,
+    "time-budget-scheduler": stopping_condition_time_budget_scheduler,
 }
 
 stopping_conditions_params = {
@@ -846,6 +1917,7 @@ stopping_conditions_params = {
     "patience-after-top-3-item-change": "number of iterations",
     "patience-after-top-4-items-change": "number of iterations",
     "patience-after-top-5-items-change": "number of iterations",
+    "time-budget-scheduler": "total time in seconds",
 }
 
 def get_stopping_condition(stopping_condition_type: str, stopping_condition_parameter: str):
@@ -854,22 +1926,61 @@ def get_stopping_condition(stopping_condition_type: str, stopping_condition_para
     else:
         return None
 
-if __name__ == "__main__":
-    if len(sys.argv) >= 7 and len(sys.argv) <= 9:
-        stopping_condition = get_stopping_condition(sys.argv[5], sys.argv[6])
+command_line_options = {
+    "fitness": "<" + '|'.join(FITNESS_MODES) + ">",
+    "workers": "<number-of-worker-processes>",
+    "seed": "<random-seed>",
+    "checkpoint-interval": "<seconds>",
+    "telemetry": "<0|1>",
+    "islands": "<number-of-islands-per-NL-item>",
+    "migration-interval": "<iterations>",
+    "migrants": "<number-of-migrants>",
+    "adaptive-population": "<0|1>",
+    "rows-format": "<" + '|'.join(EVAL_ROWS_FORMATS) + ">",
+    "sparse-rows": "<0|1>",
+}
+
+def parse_command_line_args(args: list[str]) -> tuple[list[str], dict[str, str]]:
+    positional_args = []
+    options = {}
+    for arg in args:
+        if arg.startswith("--"):
+            key, _, value = arg[2:].partition("=")
+            options[key] = value
+        else:
+            positional_args.append(arg)
+    return positional_args, options
+
+def run_command_line(args: list[str], resume_checkpoint: dict|None = None):
+    argv, options = parse_command_line_args(args)
+    for key in options:
+        if key not in command_line_options:
+            print("Unknown option: --" + key)
+            print("Options: " + ' '.join(["--" + key + "=" + command_line_options[key] for key in command_line_options]))
+            return
+    if len(argv) >= 7 and len(argv) <= 10:
+        stopping_condition = get_stopping_condition(argv[5], argv[6])
         if stopping_condition == None:
-            print("No stopping condition type found: " + sys.argv[5])
+            print("No stopping condition type found: " + argv[5])
             print("Defined stopping condition types and their params: " + str(stopping_conditions_params))
-            exit()
-        print("Stopping condition: " + sys.argv[5] + "(" + sys.argv[6] + ")")
-    if len(sys.argv) == 7:
-        codfrel_eval(sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4]), stopping_condition)
-    elif len(sys.argv) == 8:
-        codfrel_eval(sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4]), stopping_condition, int(sys.argv[7]))
-    elif len(sys.argv) == 9:
-        codfrel_eval(sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4]), stopping_condition, int(sys.argv[7]), int(sys.argv[8]))
-    elif len(sys.argv) == 10:
-        codfrel_eval(sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4]), stopping_condition, int(sys.argv[7]), int(sys.argv[8]), int(sys.argv[9]))
+            return
+        print("Stopping condition: " + argv[5] + "(" + argv[6] + ")")
+        codfrel_eval(
+            argv[1], argv[2], argv[3], int(argv[4]), stopping_condition, *[int(arg) for arg in argv[7:]],
+            fitness_mode=options.get("fitness", "population-lsi"),
+            workers=int(options.get("workers", 1)),
+            seed=int(options["seed"]) if "seed" in options else None,
+            checkpoint_interval=float(options["checkpoint-interval"]) if "checkpoint-interval" in options else None,
+            checkpoint_metadata={"args": args},
+            resume_checkpoint=resume_checkpoint,
+            telemetry=options.get("telemetry", "0") == "1",
+            islands=int(options.get("islands", 1)),
+            migration_interval=int(options.get("migration-interval", 10)),
+            migrants_count=int(options.get("migrants", 2)),
+            adaptive_population=options.get("adaptive-population", "0") == "1",
+            rows_format=options.get("rows-format", "csv"),
+            sparse_rows=options.get("sparse-rows", "0") == "1"
+        )
     else:
         print(
             "Params: <name> <jsonl-dataset-file-path> <dataset-type> <max-number-of-links>"
@@ -877,5 +1988,23 @@ if __name__ == "__main__":
             + " [<GA-population-per-NL-item>"
             + " [<number-of-parents-per-iteration> [<number-of-children-per-iteration>]]]"
         )
+        print("Options: " + ' '.join(["--" + key + "=" + command_line_options[key] for key in command_line_options]))
+        print("Or: --resume=<name> (of a run with --checkpoint-interval)")
         print("Dataset types: " + ', '.join([key for key in codfrel_row_transform_functions.nl_transforms]))
         print("Stopping condition types and their params: " + str(stopping_conditions_params))
+
+if __name__ == "__main__":
+    _, options = parse_command_line_args(sys.argv)
+    if "resume" in options:
+        checkpoint_path = os.path.join(CODFREL_EVAL_DIR, options["resume"], CHECKPOINT_FILE_NAME)
+        if not os.path.isfile(checkpoint_path):
+            print("No checkpoint found: " + checkpoint_path)
+            exit()
+        checkpoint = load_checkpoint(checkpoint_path)
+        if checkpoint == None:
+            print("Unsupported checkpoint format: " + checkpoint_path)
+            exit()
+        print("Resuming: " + ' '.join(checkpoint["metadata"]["args"][1:]))
+        run_command_line(checkpoint["metadata"]["args"], checkpoint)
+    else:
+        run_command_line(sys.argv)
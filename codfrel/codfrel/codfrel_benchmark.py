@@ -0,0 +1,251 @@
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+import codfrel
+import codfrel_row_transform_functions
+
+BENCHMARK_DIR = "codfrel_benchmark"
+SYNTHETIC_DATASET_TYPE = "codesearchnet"
+
+# Bumped whenever generate_synthetic_jsonl changes, so cached corpora of older versions are not reused
+SYNTHETIC_GENERATOR_VERSION = 2
+# Real English words, so that RAKE extracts keywords from the NL items like it does for the real datasets.
+# "item" is left out, it is used in every NL item.
+SYNTHETIC_WORDS = """
+    account action address adapter agent alarm album alert amount anchor angle animal answer archive area
+    argument array arrow article asset attachment attribute audio author badge balance banner barrier basket
+    batch battery beacon bill binding block board body bonus book border bottle boundary branch bridge browser
+    bucket budget buffer builder bundle button cable cache calendar camera campaign canvas caption card cart
+    catalog category cell center chain channel chapter character chart check child circle city claim class
+    client clock cluster code collection color column command comment company component condition config
+    connection console constant contact container content context contract control cookie coordinate copy
+    counter country coupon course cover credential credit cursor customer cycle dashboard database date deadline
+    debit decoder default delay delivery department deposit design destination detail device dialog dictionary
+    digest dimension directory discount disk display distance document domain door download draft drawer driver
+    duration editor element email employee encoder endpoint engine entity entry envelope error event exception
+    expense export extension factory feature feed field figure file filter flag flight folder font footer format
+    formula frame friend function gallery game garden gateway gender generator gesture grade graph grid group
+    guest handler hash header height helper history holder host hotel icon image import income index input
+    instance interval invoice island job journal kernel key keyboard label language layer layout leader lesson
+    letter level library license limit line link listener loan locale location lock log logger login manager map
+    margin market marker master match matrix measure media member memory menu merchant message meter method
+    metric mirror mode model module monitor month mouse movie node note notice number object offer office offset
+    option order owner package page panel parent parser partner password patch path pattern payment peer
+    permission person phone photo picture pipeline pixel place plan planet platform player plugin point policy
+    pool port portal position post price printer priority process product profile program project property
+    protocol provider proxy query queue quota radius range rate reader reason receipt record region registry
+    release report request resource response result review role room route row rule sample scale schedule schema
+    scope score screen script search season section sector segment selector sender sensor sequence server
+    service session setting shadow shape share sheet shipment signal signature site size sketch slot snapshot
+    socket source space speaker spinner stage state station status step storage store stream street student
+    style subject summary supplier survey switch symbol table tag target task teacher team template tenant
+    terminal test text theme thread ticket tile timer title token tool topic total tower track trade traffic
+    transaction transfer tree trigger type unit update upload user validator value variable vehicle vendor
+    version video view visitor volume voucher wallet warning weather widget width window worker workflow year
+    zone
+""".split()
+# The benchmark warns when fewer NL items than this ratio have PL lines containing their keywords
+MIN_KEYWORD_COVERAGE = 0.5
+
+def _to_camel_case(words: list[str]) -> str:
+    return words[0] + ''.join(word.capitalize() for word in words[1:])
+
+def generate_synthetic_jsonl(jsonl_file_path: str,
+                             nl_count: int,
+                             pl_count: int,
+                             lines_per_method: int,
+                             vocabulary_size: int,
+                             seed: int = 0):
+    # A corpus in the codesearchnet format: every PL item (a Java-like method) is linked to one NL item, and most
+    # of its identifiers are made of the words of that NL item, so the GA has something to find.
+    rng = random.Random(seed)
+    vocabulary = rng.sample(SYNTHETIC_WORDS, min(vocabulary_size, len(SYNTHETIC_WORDS)))
+    nl_topics = [rng.sample(vocabulary, min(8, len(vocabulary))) for i in range(nl_count)]
+    nl_texts = []
+    for nl_index in range(nl_count):
+        words = [rng.choice(nl_topics[nl_index]) for i in range(rng.randint(12, 24))]
+        # Two-word phrases separated by stop words: RAKE drops phrases longer than 3 words.
+        phrases = [' '.join(words[i:i + 2]) for i in range(0, len(words), 2)]
+        # Unique, so that the dataset keeps nl_count NL items
+        nl_texts.append("The " + " of the ".join(phrases) + " for item " + str(nl_index) + ".")
+    with open(jsonl_file_path, "w") as file:
+        for pl_index in range(pl_count):
+            nl_index = pl_index % nl_count
+            def get_word():
+                return rng.choice(nl_topics[nl_index]) if rng.random() < 0.5 else rng.choice(vocabulary)
+            lines = ["public void " + _to_camel_case([get_word(), get_word()]) + "() {"]
+            for i in range(lines_per_method):
+                if rng.random() < 0.1:
+                    lines.append("")
+                else:
+                    lines.append(
+                        "    int " + _to_camel_case([get_word(), get_word()]) + " = "
+                        + _to_camel_case([get_word(), get_word()]) + "(" + get_word() + ");"
+                    )
+            lines.append("}")
+            file.write(json.dumps({
+                "docstring_tokens": nl_texts[nl_index].split(),
+                "docstring": nl_texts[nl_index],
+                "code": '\n'.join(lines),
+            }) + '\n')
+
+def _get_git_commit() -> str|None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def codfrel_benchmark(output_json_path: str,
+                      nl_count: int = 100,
+                      pl_count: int = 1000,
+                      lines_per_method: int = 10,
+                      vocabulary_size: int = len(SYNTHETIC_WORDS),
+                      population_number_per_NL: int = 200,
+                      iterations: int = 20,
+                      fitness_mode: str = "population-lsi",
+                      workers: int = 1,
+                      seed: int = 0):
+    parameters = {
+        "nl_count": nl_count,
+        "pl_count": pl_count,
+        "lines_per_method": lines_per_method,
+        "vocabulary_size": vocabulary_size,
+        "population_number_per_NL": population_number_per_NL,
+        "iterations": iterations,
+        "fitness_mode": fitness_mode,
+        "workers": workers,
+        "seed": seed,
+    }
+    print("Parameters: " + str(parameters))
+    if not os.path.exists(BENCHMARK_DIR):
+        os.mkdir(BENCHMARK_DIR)
+    jsonl_file_path = os.path.join(
+        BENCHMARK_DIR,
+        "synthetic-v" + str(SYNTHETIC_GENERATOR_VERSION) + "-"
+        + '-'.join(str(value) for value in [nl_count, pl_count, lines_per_method, vocabulary_size, seed]) + ".jsonl"
+    )
+    if not os.path.isfile(jsonl_file_path):
+        print("Generating: " + jsonl_file_path)
+        generate_synthetic_jsonl(jsonl_file_path, nl_count, pl_count, lines_per_method, vocabulary_size, seed)
+    random.seed(seed)
+    t = [ 0 ]
+    times = {}
+    def start_time():
+        t[0] = time.perf_counter()
+    def report_time(name, excluded_duration=0.0):
+        duration = time.perf_counter() - t[0] - excluded_duration
+        times[name] = duration
+        print(name + ": " + str(round(duration, 3)) + "s")
+    start_time()
+    dataset = codfrel.Dataset(
+        jsonl_file_path=jsonl_file_path,
+        nl_transform_func=codfrel_row_transform_functions.nl_transforms[SYNTHETIC_DATASET_TYPE],
+        pl_transform_func=codfrel_row_transform_functions.pl_transforms[SYNTHETIC_DATASET_TYPE],
+        workers=workers
+    )
+    report_time("Loading dataset")
+    start_time()
+    preprocessed_corpus = codfrel.PreprocessedCorpus.preprocess(dataset.nl_items, dataset.pl_items, workers)
+    report_time("Preprocessing")
+    start_time()
+    ga = codfrel.CodfrelGeneticAlgorithm(
+        dataset.nl_items,
+        dataset.pl_items,
+        population_number_per_NL,
+        fitness_mode=fitness_mode,
+        workers=workers,
+        preprocessed_corpus=preprocessed_corpus
+    )
+    # The populations initialized by the constructor are the ones iterated below, their time is reported separately
+    report_time("Constructor", ga.population_initialization_time)
+    times["initialize_population"] = ga.population_initialization_time
+    print("initialize_population: " + str(round(ga.population_initialization_time, 3)) + "s")
+    # Without keywords the benchmark only measures fully random initialization
+    warnings = []
+    nl_items_with_keyword_lines = sum(1 for nl in ga.nl_items if len(ga.pl_lines_containing_keywords[nl]) != 0)
+    keyword_coverage = nl_items_with_keyword_lines / max(1, len(ga.nl_items))
+    print("NL items with PL lines containing their keywords: " + str(nl_items_with_keyword_lines) + "/" + str(len(ga.nl_items)))
+    if keyword_coverage < MIN_KEYWORD_COVERAGE:
+        warnings.append("Only " + str(nl_items_with_keyword_lines) + "/" + str(len(ga.nl_items))
+                        + " NL items have PL lines containing their keywords.")
+        print("[Warning]: " + warnings[-1])
+    start_time()
+    for i in range(iterations):
+        for nl in ga.nl_items:
+            ga.iterate_population(nl)
+        ga.global_iteration_number += 1
+    report_time("iterate_population")
+    start_time()
+    codfrel.EvalMAPMetricsFromPopulation(ga, dataset)
+    report_time("MAP from population")
+    start_time()
+    min_fitness_values, min_lines_ratio_values = codfrel.get_eval_config_values()
+    config_sweep = codfrel.EvalConfigSweep(ga, dataset, min_fitness_values, min_lines_ratio_values)
+    config_sweep.get_best_f1_config()
+    report_time("Config sweep")
+    result = {
+        "parameters": parameters,
+        "times": times,
+        "iterate_population_time_per_call": times["iterate_population"] / max(1, iterations * len(ga.nl_items)),
+        "corpus": {
+            "nl_count": len(dataset.nl_items),
+            "pl_count": len(dataset.pl_items),
+            "pl_line_count": ga.corpus.pl_line_count,
+            "links_count": dataset.links_count,
+            "vocabulary_size": min(vocabulary_size, len(SYNTHETIC_WORDS)),
+            "keyword_coverage": keyword_coverage,
+        },
+        "warnings": warnings,
+        "git_commit": _get_git_commit(),
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.time(),
+    }
+    with open(output_json_path, "w") as file:
+        json.dump(result, file, indent=2)
+    print("Results: " + output_json_path)
+
+command_line_options = {
+    "nl-count": "<number>",
+    "pl-count": "<number>",
+    "lines-per-method": "<number>",
+    "vocabulary-size": "<number>",
+    "population": "<GA-population-per-NL-item>",
+    "iterations": "<number-of-iterations-per-NL-item>",
+    "fitness": "<" + '|'.join(codfrel.FITNESS_MODES) + ">",
+    "workers": "<number-of-worker-processes>",
+    "seed": "<random-seed>",
+}
+
+if __name__ == "__main__":
+    argv, options = codfrel.parse_command_line_args(sys.argv)
+    unknown_options = [key for key in options if key not in command_line_options]
+    if len(argv) != 2 or len(unknown_options) != 0:
+        if len(unknown_options) != 0:
+            print("Unknown options: " + ' '.join(["--" + key for key in unknown_options]))
+        print("Params: <output-json-file-path>")
+        print("Options: " + ' '.join(["--" + key + "=" + command_line_options[key] for key in command_line_options]))
+        exit()
+    codfrel_benchmark(
+        argv[1],
+        nl_count=int(options.get("nl-count", 100)),
+        pl_count=int(options.get("pl-count", 1000)),
+        lines_per_method=int(options.get("lines-per-method", 10)),
+        vocabulary_size=int(options.get("vocabulary-size", len(SYNTHETIC_WORDS))),
+        population_number_per_NL=int(options.get("population", 200)),
+        iterations=int(options.get("iterations", 20)),
+        fitness_mode=options.get("fitness", "population-lsi"),
+        workers=int(options.get("workers", 1)),
+        seed=int(options.get("seed", 0))
+    )
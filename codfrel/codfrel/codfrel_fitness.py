@@ -0,0 +1,197 @@
+import gensim
+import gensim.matutils
+import gensim.models
+import numpy as np
+import random
+import scipy.sparse
+
+LSI_NUM_TOPICS = 20
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Every backend scores a whole population in one call: The population is a sparse membership matrix
+# (population items x PL lines), multiplied with a PL line matrix (PL lines x vocabulary or LSI topics).
+# All scores are cosine-like values s in [-1, 1] (or [0, 1]) mapped to (s + 1) / 2, so that they are comparable
+# with the min_fitness values of the evaluation.
+
+def get_membership_matrix(line_indices_list: list[np.ndarray], pl_line_count: int) -> scipy.sparse.csr_matrix:
+    # Population items x PL lines, 1 where the item contains the line
+    indptr = np.zeros(len(line_indices_list) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(line_indices) for line_indices in line_indices_list])
+    indices = np.concatenate(line_indices_list) if len(line_indices_list) != 0 else np.zeros(0, dtype=np.int32)
+    return scipy.sparse.csr_matrix(
+        (np.ones(len(indices), dtype=np.float64), indices, indptr), shape=(len(line_indices_list), pl_line_count)
+    )
+
+def get_line_term_matrix(corpus) -> scipy.sparse.csr_matrix:
+    # PL lines x vocabulary, token counts
+    # The arrays are copied, sum_duplicates sorts and compacts them in place and they belong to the corpus.
+    matrix = scipy.sparse.csr_matrix(
+        (np.ones(len(corpus.pl_line_token_ids), dtype=np.float64), corpus.pl_line_token_ids.copy(), corpus.pl_line_token_offsets.copy()),
+        shape=(corpus.pl_line_count, len(corpus.vocabulary))
+    )
+    matrix.sum_duplicates()
+    return matrix
+
+def _cosine_scores(item_vectors, nl_vector: np.ndarray, item_norms: np.ndarray) -> np.ndarray:
+    dots = np.asarray(item_vectors @ nl_vector).ravel()
+    norms = item_norms * np.linalg.norm(nl_vector)
+    # Zero vectors have a cosine similarity of 0, same as gensim.matutils.cossim
+    cossims = np.divide(dots, norms, out=np.zeros_like(dots), where=norms != 0)
+    return (cossims + 1) / 2 # in range [0, 1]
+
+class FitnessBackend:
+    # True if the scores depend on the rest of the population, so scores of different populations aren't comparable
+    population_relative = False
+
+    def __init__(self, corpus):
+        self.corpus = corpus
+
+    def calculate_scores(self, nl_item, line_indices_list: list[np.ndarray]) -> np.ndarray:
+        raise NotImplementedError()
+
+    def remove_nl_item(self, nl_item):
+        # Called when an NL item is removed from the GA, to free anything cached for it
+        pass
+
+class _LSIFitnessBackend(FitnessBackend):
+    def __init__(self, corpus):
+        super().__init__(corpus)
+        # Position of each token id in the sorted vocabulary
+        self.vocabulary_ranks = np.empty(len(corpus.vocabulary), dtype=np.int64)
+        self.vocabulary_ranks[np.argsort(np.array(corpus.vocabulary, dtype=str), kind="stable")] = np.arange(len(corpus.vocabulary))
+
+    def _get_bow_corpus(self, token_ids: np.ndarray, lengths: np.ndarray) -> tuple[gensim.matutils.Sparse2Corpus, np.ndarray]:
+        # A bag-of-words corpus of consecutive documents of token_ids with the given lengths, built from token ids
+        # directly. Terms get the ids gensim.corpora.Dictionary would give them (first appearance, then token order
+        # in a document), so the LSI results are the same as with a dictionary of the token strings.
+        # Also returns the term ids by token id (-1 if not in the corpus).
+        document_indices = np.repeat(np.arange(len(lengths), dtype=np.int64), lengths)
+        unique_token_ids, first_positions = np.unique(token_ids, return_index=True)
+        term_order = np.lexsort((self.vocabulary_ranks[unique_token_ids], document_indices[first_positions]))
+        term_ids_by_token_id = np.full(len(self.corpus.vocabulary), -1, dtype=np.int64)
+        term_ids_by_token_id[unique_token_ids[term_order]] = np.arange(len(unique_token_ids))
+        matrix = scipy.sparse.csc_matrix(
+            (np.ones(len(token_ids), dtype=np.float64), (term_ids_by_token_id[token_ids], document_indices)),
+            shape=(len(unique_token_ids), len(lengths))
+        )
+        matrix.sum_duplicates()
+        matrix.sort_indices()
+        return gensim.matutils.Sparse2Corpus(matrix, documents_columns=True), term_ids_by_token_id
+
+    def _train_lsi_model(self, bow_corpus: gensim.matutils.Sparse2Corpus) -> gensim.models.LsiModel:
+        # The seed is drawn from random, so seeding random (per worker shard too) makes the randomized SVD reproducible
+        return gensim.models.LsiModel(
+            corpus=bow_corpus,
+            num_topics=LSI_NUM_TOPICS,
+            id2word={i: i for i in range(bow_corpus.sparse.shape[0])},
+            random_seed=random.getrandbits(32)
+        )
+
+class PopulationLSIFitnessBackend(_LSIFitnessBackend):
+    # Trains an LSI model on each NL item and its population on every call.
+    population_relative = True
+
+    def calculate_scores(self, nl_item, line_indices_list: list[np.ndarray]) -> np.ndarray:
+        # Documents: The population items (their lines' tokens concatenated), then the NL item
+        line_ids = np.concatenate(line_indices_list) if len(line_indices_list) != 0 else np.zeros(0, dtype=np.int32)
+        line_token_ids, line_lengths = self.corpus.get_pl_lines_token_ids(line_ids)
+        line_token_offsets = np.zeros(len(line_lengths) + 1, dtype=np.int64)
+        line_token_offsets[1:] = np.cumsum(line_lengths)
+        item_line_offsets = np.zeros(len(line_indices_list) + 1, dtype=np.int64)
+        item_line_offsets[1:] = np.cumsum([len(line_indices) for line_indices in line_indices_list])
+        item_lengths = np.diff(line_token_offsets[item_line_offsets])
+        bow_corpus, _ = self._get_bow_corpus(
+            np.concatenate([line_token_ids, nl_item.token_ids]), np.append(item_lengths, len(nl_item.token_ids))
+        )
+        lsi_model = self._train_lsi_model(bow_corpus)
+        vectors = gensim.matutils.corpus2dense(lsi_model[bow_corpus], lsi_model.num_topics, len(bow_corpus), dtype=np.float64).T
+        item_vectors = vectors[:-1]
+        return _cosine_scores(item_vectors, vectors[-1], np.linalg.norm(item_vectors, axis=1))
+
+class CorpusLSIFitnessBackend(_LSIFitnessBackend):
+    # Trains an LSI model on all PL lines once and folds the NL items in.
+    def __init__(self, corpus):
+        super().__init__(corpus)
+        bow_corpus, self.term_ids_by_token_id = self._get_bow_corpus(corpus.pl_line_token_ids, np.diff(corpus.pl_line_token_offsets))
+        self.lsi_model = self._train_lsi_model(bow_corpus)
+        # The LSI projection is linear, so the vector of a population item (its lines' tokens concatenated)
+        # is the sum of its lines' vectors.
+        self.line_vectors = gensim.matutils.corpus2dense(
+            self.lsi_model[bow_corpus], self.lsi_model.num_topics, len(bow_corpus), dtype=np.float64
+        ).T
+        self.nl_vectors: dict[int, np.ndarray] = {}
+        for nl in corpus.nl_items:
+            self._get_nl_vector(nl)
+
+    def _get_nl_vector(self, nl_item) -> np.ndarray:
+        if nl_item.nl_index not in self.nl_vectors:
+            term_ids = self.term_ids_by_token_id[nl_item.token_ids]
+            term_ids, counts = np.unique(term_ids[term_ids >= 0], return_counts=True)
+            bow = list(zip(term_ids.tolist(), counts.tolist()))
+            self.nl_vectors[nl_item.nl_index] = gensim.matutils.sparse2full(self.lsi_model[bow], self.lsi_model.num_topics)
+        return self.nl_vectors[nl_item.nl_index]
+
+    def calculate_scores(self, nl_item, line_indices_list: list[np.ndarray]) -> np.ndarray:
+        item_vectors = get_membership_matrix(line_indices_list, self.corpus.pl_line_count) @ self.line_vectors
+        return _cosine_scores(item_vectors, self._get_nl_vector(nl_item), np.linalg.norm(item_vectors, axis=1))
+
+    def remove_nl_item(self, nl_item):
+        self.nl_vectors.pop(nl_item.nl_index, None)
+
+def _get_pl_item_count(corpus) -> int:
+    return int(corpus.pl_line_pl_indices.max(initial=-1)) + 1
+
+def _get_pl_item_document_frequencies(corpus) -> np.ndarray:
+    # Number of PL items containing each token id
+    pl_item_count = max(1, _get_pl_item_count(corpus))
+    token_pl_indices = np.repeat(corpus.pl_line_pl_indices.astype(np.int64), np.diff(corpus.pl_line_token_offsets))
+    pairs = np.unique(corpus.pl_line_token_ids.astype(np.int64) * pl_item_count + token_pl_indices)
+    return np.bincount(pairs // pl_item_count, minlength=len(corpus.vocabulary))
+
+class TFIDFFitnessBackend(FitnessBackend):
+    # Cosine similarity of TF-IDF vectors, with the PL items as the documents for the IDF.
+    def __init__(self, corpus):
+        super().__init__(corpus)
+        pl_item_count = _get_pl_item_count(corpus)
+        self.idf = np.log((1 + pl_item_count) / (1 + _get_pl_item_document_frequencies(corpus))) + 1
+        # TF-IDF is linear in the term counts, so the lines can be weighted once
+        self.line_weights = (get_line_term_matrix(corpus) @ scipy.sparse.diags(self.idf)).tocsr()
+
+    def calculate_scores(self, nl_item, line_indices_list: list[np.ndarray]) -> np.ndarray:
+        item_vectors = get_membership_matrix(line_indices_list, self.corpus.pl_line_count) @ self.line_weights
+        nl_vector = np.bincount(nl_item.token_ids, minlength=len(self.idf)) * self.idf
+        item_norms = np.sqrt(np.asarray(item_vectors.multiply(item_vectors).sum(axis=1)).ravel())
+        return _cosine_scores(item_vectors, nl_vector, item_norms)
+
+class BM25FitnessBackend(FitnessBackend):
+    # Okapi BM25 of the NL item as the query, with the PL items as the documents for the IDF and the average
+    # length. Divided by the maximum possible score of the query, so that it's in [0, 1].
+    def __init__(self, corpus):
+        super().__init__(corpus)
+        pl_item_count = _get_pl_item_count(corpus)
+        document_frequencies = _get_pl_item_document_frequencies(corpus)
+        self.idf = np.log(1 + (pl_item_count - document_frequencies + 0.5) / (document_frequencies + 0.5))
+        self.line_term_matrix = get_line_term_matrix(corpus).tocsc() # For selecting the query terms
+        self.line_lengths = np.diff(corpus.pl_line_token_offsets).astype(np.float64)
+        self.average_length = max(1.0, len(corpus.pl_line_token_ids) / max(1, pl_item_count))
+
+    def calculate_scores(self, nl_item, line_indices_list: list[np.ndarray]) -> np.ndarray:
+        query_token_ids, query_counts = np.unique(nl_item.token_ids, return_counts=True)
+        membership_matrix = get_membership_matrix(line_indices_list, self.corpus.pl_line_count)
+        term_frequencies = (membership_matrix @ self.line_term_matrix[:, query_token_ids]).toarray()
+        lengths = membership_matrix @ self.line_lengths
+        length_norms = BM25_K1 * (1 - BM25_B + BM25_B * lengths / self.average_length)
+        weights = query_counts * self.idf[query_token_ids]
+        scores = (term_frequencies * (BM25_K1 + 1) / (term_frequencies + length_norms[:, np.newaxis])) @ weights
+        max_score = (BM25_K1 + 1) * weights.sum()
+        if max_score == 0:
+            return np.full(len(line_indices_list), 0.5)
+        return (scores / max_score + 1) / 2 # in range [0.5, 1]
+
+fitness_backends = {
+    "population-lsi": PopulationLSIFitnessBackend,
+    "corpus-lsi": CorpusLSIFitnessBackend,
+    "tfidf": TFIDFFitnessBackend,
+    "bm25": BM25FitnessBackend,
+}
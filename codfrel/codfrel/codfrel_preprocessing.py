@@ -0,0 +1,142 @@
+import concurrent.futures
+import functools
+import multi_rake
+import nltk
+import nltk.stem
+import nltk.tag
+import nltk.tokenize
+
+POS_TAGS_TO_REMOVE = { "CC", "DT", "EX", "IN", "MD", "PDT", "POS", "PRP", "PRP$", "TO", "UH", "WDT", "WP", "WRB"}
+
+POS_TAGGING_BATCH_SIZE = 4096
+PARALLEL_CHUNK_SIZE = 20000
+
+# Shared instances, created on first use (per process)
+_tagger = None
+_lemmatizer = None
+_rake = None
+
+def _get_tagger():
+    global _tagger
+    if _tagger == None:
+        # The same tagger nltk.pos_tag creates on every call
+        _tagger = nltk.tag.PerceptronTagger()
+    return _tagger
+
+def _get_rake():
+    global _rake
+    if _rake == None:
+        _rake = multi_rake.Rake()
+    return _rake
+
+@functools.lru_cache(maxsize=None)
+def _lemmatize(word: str) -> str:
+    global _lemmatizer
+    if _lemmatizer == None:
+        _lemmatizer = nltk.stem.WordNetLemmatizer()
+    return _lemmatizer.lemmatize(word)
+
+def _filter_pos_tag_and_lemmatize(token_lists: list[list[str]]) -> list[list[str]]:
+    # POS tags depend on the whole token sequence, so identical sequences are tagged once and tagging is
+    # batched per sequence (never across sequences).
+    unique_token_lists = list(dict.fromkeys(tuple(tokens) for tokens in token_lists))
+    results: dict[tuple[str, ...], list[str]] = {}
+    tagger = _get_tagger()
+    for start in range(0, len(unique_token_lists), POS_TAGGING_BATCH_SIZE):
+        batch = unique_token_lists[start:start + POS_TAGGING_BATCH_SIZE]
+        for tokens, tagged_tokens in zip(batch, tagger.tag_sents([list(tokens) for tokens in batch])):
+            results[tokens] = [_lemmatize(item[0]) for item in tagged_tokens if item[1] not in POS_TAGS_TO_REMOVE]
+    return [results[tuple(tokens)] for tokens in token_lists]
+
+def _map_unique_texts(function, texts: list[str], workers: int = 1) -> list:
+    # Identical texts are processed once and share the result.
+    unique_texts = list(dict.fromkeys(texts))
+    if workers > 1 and len(unique_texts) > PARALLEL_CHUNK_SIZE:
+        chunks = [unique_texts[i:i + PARALLEL_CHUNK_SIZE] for i in range(0, len(unique_texts), PARALLEL_CHUNK_SIZE)]
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            results = [result for chunk_results in executor.map(function, chunks) for result in chunk_results]
+    else:
+        results = function(unique_texts)
+    text_to_result = dict(zip(unique_texts, results))
+    return [text_to_result[text] for text in texts]
+
+def _nl_split_tokens(nl_text: str) -> list[str]:
+    return [ word.lower() for word in nltk.tokenize.word_tokenize(nl_text) if word.isalpha() ]
+
+def _nl_get_tokens_of_unique_texts(nl_texts: list[str]) -> list[list[str]]:
+    # Tokenization
+    token_lists = [_nl_split_tokens(nl_text) for nl_text in nl_texts]
+    # POS Tagging & Lemmatization
+    return _filter_pos_tag_and_lemmatize(token_lists)
+
+def _nl_get_keywords_of_unique_texts(nl_texts: list[str]) -> list[list[str]]:
+    rake = _get_rake()
+    keyword_texts = [' '.join([item[0] for item in rake.apply(nl_text)]) for nl_text in nl_texts]
+    return _nl_get_tokens_of_unique_texts(keyword_texts)
+
+def nl_get_tokens_batch(nl_texts: list[str], workers: int = 1) -> list[list[str]]:
+    return _map_unique_texts(_nl_get_tokens_of_unique_texts, nl_texts, workers)
+
+def nl_get_keywords_batch(nl_texts: list[str], workers: int = 1) -> list[list[str]]:
+    return _map_unique_texts(_nl_get_keywords_of_unique_texts, nl_texts, workers)
+
+def nl_get_tokens(nl_text: str) -> list[str]:
+    return nl_get_tokens_batch([nl_text])[0]
+
+def nl_get_keywords(nl_text: str) -> list[str]:
+    return nl_get_keywords_batch([nl_text])[0]
+
+def _pl_tokenize_name(name: str) -> list[str]:
+    words = []
+    current_word = ""
+    for ch in name:
+        if ch.isalpha():
+            if len(current_word) != 0 and ch.isupper() and current_word[-1].islower():
+                words.append(current_word)
+                current_word = ""
+            current_word += ch
+        elif len(current_word) != 0:
+            words.append(current_word)
+            current_word = ""
+    if len(current_word) != 0:
+        words.append(current_word)
+        current_word = ""
+    return words
+
+def _pl_tokenize_names(names: list[str]) -> list[str]:
+    result = []
+    for name in names:
+        for word in _pl_tokenize_name(name):
+            result.append(word)
+    return result
+
+JAVA_RESERVED_WORDS = {
+    "abstract", "assert", "boolean", "break", "byte", "case", "catch", "char", "class", "const",
+    "continue", "default", "do", "double", "else", "enum", "extends", "final", "finally", "float",
+    "for", "goto", "if", "implements", "import", "instanceof", "int", "interface", "long", "native",
+    "new", "package", "private", "protected", "public", "return", "short", "static", "strictfp", "super",
+    "switch", "synchronized", "this", "throw", "throws", "transient", "try", "void", "volatile", "while",
+    "true", "false", "null",
+}
+
+def _pl_split_tokens(pl_text: str) -> list[str]:
+    # Tokenization 1
+    result = ''.join([ ch if ch.isalpha() else ' ' for ch in pl_text ])
+    result = result.split()
+    # Reserved words removal
+    result = [ token for token in result if token not in JAVA_RESERVED_WORDS ]
+    # Tokenization 2
+    result = [ word.lower() for word in _pl_tokenize_names(result) ]
+    return result
+
+def _pl_get_tokens_of_unique_texts(pl_texts: list[str]) -> list[list[str]]:
+    # Tokenization
+    token_lists = [_pl_split_tokens(pl_text) for pl_text in pl_texts]
+    # POS Tagging & Lemmatization
+    return _filter_pos_tag_and_lemmatize(token_lists)
+
+def pl_get_tokens_batch(pl_texts: list[str], workers: int = 1) -> list[list[str]]:
+    return _map_unique_texts(_pl_get_tokens_of_unique_texts, pl_texts, workers)
+
+def pl_get_tokens(pl_text: str) -> list[str]:
+    return pl_get_tokens_batch([pl_text])[0]
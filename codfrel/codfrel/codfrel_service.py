@@ -0,0 +1,235 @@
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+import codfrel
+import codfrel_preprocessing
+import codfrel_row_transform_functions
+
+# Protocol: One JSON object per line on stdin, one response per line on stdout, in the order of completion.
+# Request:  {"id": <any>, "text": <NL text>, "time": <seconds, optional>, "iterations": <max, optional>, "top": <count, optional>}
+# Response: {"id": <same>, "methods": [{"pl_index", "score"}, ...], "lines": [{"pl_index", "line_index", "score", "text"}, ...],
+#            "iterations": <GA iterations>, "time": <seconds>}
+#           or {"id": <same>, "error": <message>}
+# Everything else (progress, warnings) goes to stderr.
+
+DEFAULT_QUERY_TIME = 10
+DEFAULT_QUERY_ITERATIONS = 1000
+DEFAULT_TOP_COUNT = 10
+SERVICE_PREPROCESSED_SUFFIX = "-pl.npz" # The PL items only, next to the preprocessed corpora of codfrel_eval
+
+class CodfrelService:
+    def __init__(self, pl_list: list[str], population_number_per_NL: int = 1000,
+                 number_of_parents: int = 7, number_of_children: int = 21,
+                 fitness_mode: str = "corpus-lsi",
+                 preprocessed_corpus: codfrel.PreprocessedCorpus|None = None):
+        if preprocessed_corpus == None:
+            preprocessed_corpus = codfrel.PreprocessedCorpus.preprocess([], pl_list)
+        self.pl_lines = [pl.splitlines() for pl in pl_list]
+        # The GA keeps the corpus, the keyword index and the fitness model. The queries are added to it as NL items.
+        self.ga = codfrel.CodfrelGeneticAlgorithm(
+            [],
+            pl_list,
+            population_number_per_NL,
+            number_of_parents=number_of_parents,
+            number_of_children=number_of_children,
+            fitness_mode=fitness_mode,
+            preprocessed_corpus=preprocessed_corpus
+        )
+        self.token_ids_by_token = {token: token_id for token_id, token in enumerate(preprocessed_corpus.vocabulary)}
+        # Loads the NLTK models now, so that the worker processes inherit them
+        codfrel_preprocessing.nl_get_tokens("Warm up.")
+        codfrel_preprocessing.nl_get_keywords("Warm up.")
+
+    def _get_token_ids(self, tokens: list[str]) -> np.ndarray:
+        # Tokens that don't appear in the corpus are dropped, they can't match any PL line anyway.
+        return np.array([self.token_ids_by_token[token] for token in tokens if token in self.token_ids_by_token], dtype=np.int32)
+
+    def query(self, nl_index: int, text: str, time_limit: float, max_iterations: int, top_count: int) -> dict:
+        start_time = time.time()
+        nl = codfrel.NLItemInfo(
+            nl_index,
+            self._get_token_ids(codfrel_preprocessing.nl_get_tokens(text)),
+            self._get_token_ids(codfrel_preprocessing.nl_get_keywords(text))
+        )
+        ga = self.ga
+        ga.add_nl_item(nl)
+        try:
+            ga.global_iteration_number = 0
+            ga.run(lambda ga, nl_item: time.time() - start_time >= time_limit or ga.iteration_numbers[nl_item] >= max_iterations)
+            result = self._get_ranking(ga.populations[nl], top_count)
+            result["iterations"] = ga.iteration_numbers[nl]
+        finally:
+            ga.remove_nl_item(nl)
+        result["time"] = time.time() - start_time
+        return result
+
+    def _get_ranking(self, population: list[codfrel.PopulationItem], top_count: int) -> dict:
+        # The score of a line is the best fitness score of the items containing it (the population is sorted),
+        # the score of a method is the best score of its lines.
+        if len(population) == 0:
+            return {"methods": [], "lines": []}
+        line_indices = np.concatenate([item.line_indices for item in population])
+        line_scores = np.repeat([item.fitness_score for item in population], [len(item.line_indices) for item in population])
+        line_indices, first_positions = np.unique(line_indices, return_index=True)
+        order = np.argsort(first_positions, kind="stable")
+        line_indices = line_indices[order]
+        line_scores = line_scores[first_positions[order]]
+        pl_indices = self.ga.pl_line_pl_indices[line_indices]
+        _, first_pl_positions = np.unique(pl_indices, return_index=True)
+        first_pl_positions.sort()
+        methods = [
+            {"pl_index": int(pl_indices[i]), "score": float(line_scores[i])}
+            for i in first_pl_positions[:top_count].tolist()
+        ]
+        lines = []
+        for i in range(min(top_count, len(line_indices))):
+            pl_index = int(pl_indices[i])
+            line_index = int(self.ga.pl_line_line_indices[line_indices[i]])
+            lines.append({
+                "pl_index": pl_index,
+                "line_index": line_index,
+                "score": float(line_scores[i]),
+                "text": self.pl_lines[pl_index][line_index],
+            })
+        return {"methods": methods, "lines": lines}
+
+    def handle_request(self, nl_index: int, request) -> dict:
+        if not isinstance(request, dict) or not isinstance(request.get("text"), str):
+            return {"id": request.get("id") if isinstance(request, dict) else None, "error": "A request needs a \"text\"."}
+        try:
+            result = self.query(
+                nl_index,
+                request["text"],
+                float(request.get("time", DEFAULT_QUERY_TIME)),
+                int(request.get("iterations", DEFAULT_QUERY_ITERATIONS)),
+                int(request.get("top", DEFAULT_TOP_COUNT))
+            )
+        except (TypeError, ValueError) as e:
+            return {"id": request.get("id"), "error": str(e)}
+        return {"id": request.get("id"), **result}
+
+# The worker processes are forked, so they inherit this without pickling the corpus and the models.
+_service: CodfrelService|None = None
+
+def _worker_initialize():
+    # Progress output of the GA must not get mixed with the responses
+    sys.stdout = sys.stderr
+
+def _worker_handle_request(nl_index: int, request) -> dict:
+    return _service.handle_request(nl_index, request)
+
+def serve(service: CodfrelService, workers: int, input_file, output_file):
+    global _service
+    output_lock = threading.Lock()
+    def write_response(response: dict):
+        with output_lock:
+            output_file.write(json.dumps(response) + '\n')
+            output_file.flush()
+    def on_done(future: concurrent.futures.Future, request):
+        if future.exception() != None:
+            write_response({"id": request.get("id") if isinstance(request, dict) else None, "error": str(future.exception())})
+        else:
+            write_response(future.result())
+    _service = service
+    with concurrent.futures.ProcessPoolExecutor(
+        workers, mp_context=multiprocessing.get_context("fork"), initializer=_worker_initialize
+    ) as executor:
+        # Each query gets its own NL index, so that nothing cached for one query is used for another
+        for nl_index, line in enumerate(input_file):
+            if line.strip() == "":
+                continue
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                write_response({"id": None, "error": "Invalid JSON: " + str(e)})
+                continue
+            future = executor.submit(_worker_handle_request, nl_index, request)
+            future.add_done_callback(lambda future, request=request: on_done(future, request))
+
+def codfrel_service(jsonl_file_path: str,
+                    dataset_type: str,
+                    max_pl_count: int|None = None,
+                    population_number_per_NL: int = 1000,
+                    fitness_mode: str = "corpus-lsi",
+                    workers: int = 1):
+    protocol_output = sys.stdout
+    # Everything printed from here on is for humans
+    sys.stdout = sys.stderr
+    if not os.path.isfile(jsonl_file_path):
+        print("No such file: " + jsonl_file_path)
+        return
+    if dataset_type not in codfrel_row_transform_functions.pl_transforms:
+        print("No dataset type found: " + dataset_type)
+        print("Defined dataset types: " + ', '.join([key for key in codfrel_row_transform_functions.pl_transforms]))
+        return
+    if fitness_mode not in codfrel.FITNESS_MODES:
+        print("No fitness mode found: " + fitness_mode)
+        print("Defined fitness modes: " + ', '.join(codfrel.FITNESS_MODES))
+        return
+    print("Loading dataset...")
+    dataset = codfrel.Dataset(
+        jsonl_file_path=jsonl_file_path,
+        nl_transform_func=codfrel_row_transform_functions.nl_transforms[dataset_type],
+        pl_transform_func=codfrel_row_transform_functions.pl_transforms[dataset_type],
+        max_pl_count=max_pl_count,
+        workers=workers
+    )
+    print("PL count: " + str(len(dataset.pl_items)))
+    print("Preprocessing...")
+    preprocessed_dir = os.path.join(codfrel.CODFREL_EVAL_DIR, codfrel.CODFREL_EVAL_PREPROCESSED_DIR)
+    os.makedirs(preprocessed_dir, exist_ok=True)
+    preprocessed_corpus_path = os.path.join(
+        preprocessed_dir,
+        codfrel.get_preprocessed_corpus_fingerprint(jsonl_file_path, dataset_type, None, None, max_pl_count) + SERVICE_PREPROCESSED_SUFFIX
+    )
+    preprocessed_corpus = None
+    if os.path.isfile(preprocessed_corpus_path):
+        print("Loading preprocessed corpus: " + preprocessed_corpus_path)
+        preprocessed_corpus = codfrel.PreprocessedCorpus.load(preprocessed_corpus_path)
+    if preprocessed_corpus == None:
+        preprocessed_corpus = codfrel.PreprocessedCorpus.preprocess([], dataset.pl_items, workers)
+        preprocessed_corpus.save(preprocessed_corpus_path)
+        print("Saved preprocessed corpus: " + preprocessed_corpus_path)
+    print("Initializing...")
+    service = CodfrelService(
+        dataset.pl_items,
+        population_number_per_NL,
+        fitness_mode=fitness_mode,
+        preprocessed_corpus=preprocessed_corpus
+    )
+    print("Ready.")
+    serve(service, workers, sys.stdin, protocol_output)
+
+command_line_options = {
+    "max-pl-count": "<number>",
+    "population": "<GA-population-per-query>",
+    "fitness": "<" + '|'.join(codfrel.FITNESS_MODES) + ">",
+    "workers": "<number-of-worker-processes>",
+}
+
+if __name__ == "__main__":
+    argv, options = codfrel.parse_command_line_args(sys.argv)
+    unknown_options = [key for key in options if key not in command_line_options]
+    if len(argv) != 3 or len(unknown_options) != 0:
+        if len(unknown_options) != 0:
+            print("Unknown options: " + ' '.join(["--" + key for key in unknown_options]))
+        print("Params: <jsonl-dataset-file-path> <dataset-type>")
+        print("Options: " + ' '.join(["--" + key + "=" + command_line_options[key] for key in command_line_options]))
+        print("Requests are read from stdin, one JSON object per line:")
+        print("{\"id\": <any>, \"text\": <NL text>, \"time\": <seconds>, \"iterations\": <max>, \"top\": <count>}")
+        exit()
+    codfrel_service(
+        argv[1],
+        argv[2],
+        max_pl_count=int(options["max-pl-count"]) if "max-pl-count" in options else None,
+        population_number_per_NL=int(options.get("population", 1000)),
+        fitness_mode=options.get("fitness", "corpus-lsi"),
+        workers=int(options.get("workers", 1))
+    )
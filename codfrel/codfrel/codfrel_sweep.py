@@ -0,0 +1,214 @@
+import concurrent.futures
+import csv
+import itertools
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import codfrel
+import codfrel_row_transform_functions
+
+CODFREL_SWEEP_DIR = "codfrel_sweep"
+SWEEP_RESULTS_FILE_NAME = "results.csv"
+
+# Grid options: Comma separated values, every combination is a config.
+# Stopping conditions are given as <type>:<parameter>, e.g. --stopping-condition=iterations:100,time-per-nl:10
+grid_options = {
+    "population": "1000",
+    "parents": "7",
+    "children": "21",
+    "stopping-condition": None, # Required
+    "fitness": "population-lsi",
+    "adaptive-population": "0",
+}
+
+SWEEP_RESULTS_COLUMNS = [
+    "config_index", *grid_options,
+    "time", "iterations", "best_f1_config", "precision", "recall", "f1", "f2",
+    "best_f1_0_min_lines_ratio_config", "f1_0_min_lines_ratio",
+    *["MAP@" + str(i) for i in range(1, 11)],
+]
+
+def get_sweep_configs(grid: dict[str, list[str]]) -> list[dict[str, str]]:
+    return [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+
+# The worker processes are forked after loading and preprocessing, so they share these (copy-on-write)
+# instead of loading, tokenizing and indexing the dataset again for every config.
+_sweep_dataset: codfrel.Dataset|None = None
+_sweep_preprocessed_corpus: codfrel.PreprocessedCorpus|None = None
+
+def _worker_initialize():
+    # Each config would print its own progress bars
+    sys.stdout = open(os.devnull, "w")
+
+def _worker_run_config(config_index: int, config: dict[str, str], seed: int) -> dict:
+    dataset = _sweep_dataset
+    random.seed(seed)
+    stopping_condition_type, _, stopping_condition_parameter = config["stopping-condition"].partition(":")
+    start_time = time.time()
+    ga = codfrel.CodfrelGeneticAlgorithm(
+        dataset.nl_items,
+        dataset.pl_items,
+        int(config["population"]),
+        number_of_parents=int(config["parents"]),
+        number_of_children=int(config["children"]),
+        fitness_mode=config["fitness"],
+        preprocessed_corpus=_sweep_preprocessed_corpus,
+        adaptive_population=config["adaptive-population"] == "1"
+    )
+    ga.run(codfrel.get_stopping_condition(stopping_condition_type, stopping_condition_parameter))
+    run_time = time.time() - start_time
+    map_metrics = codfrel.EvalMAPMetricsFromPopulation(ga, dataset)
+    min_fitness_values, min_lines_ratio_values = codfrel.get_eval_config_values()
+    config_sweep = codfrel.EvalConfigSweep(ga, dataset, min_fitness_values, min_lines_ratio_values)
+    best_f1_config = config_sweep.get_best_f1_config()
+    best_f1_zero_min_lines_ratio_config = config_sweep.get_best_f1_config(min_lines_ratio_i=0)
+    result = {"config_index": config_index, **config, "time": run_time, "iterations": sum(ga.iteration_numbers.values())}
+    if best_f1_config != None:
+        result["best_f1_config"] = config_sweep.get_config_str(*best_f1_config)
+        result["precision"], result["recall"], result["f1"], result["f2"] = codfrel.calculate_precision_recall_f1_f2(
+            int(config_sweep.tp[best_f1_config]), int(config_sweep.fp[best_f1_config]), int(config_sweep.fn[best_f1_config])
+        )
+    if best_f1_zero_min_lines_ratio_config != None:
+        result["best_f1_0_min_lines_ratio_config"] = config_sweep.get_config_str(*best_f1_zero_min_lines_ratio_config)
+        result["f1_0_min_lines_ratio"] = config_sweep.get_f1(*best_f1_zero_min_lines_ratio_config)
+    for i in map_metrics.map_at:
+        result["MAP@" + str(i)] = map_metrics.map_at[i]
+    return result
+
+def write_sweep_results(path: str, results: list[dict]):
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, SWEEP_RESULTS_COLUMNS)
+        writer.writeheader()
+        writer.writerows(sorted(results, key=lambda result: result["config_index"]))
+
+def codfrel_sweep(name: str,
+                  jsonl_file_path: str,
+                  dataset_type: str,
+                  max_links_count: int|None,
+                  grid: dict[str, list[str]],
+                  max_nl_count: int|None = None,
+                  max_pl_count: int|None = None,
+                  workers: int = 1,
+                  seed: int|None = None):
+    if max_links_count != None and max_links_count <= 0:
+        max_links_count = None
+    if max_nl_count != None and max_nl_count <= 0:
+        max_nl_count = None
+    if max_pl_count != None and max_pl_count <= 0:
+        max_pl_count = None
+    # Checks
+    if not os.path.isfile(jsonl_file_path):
+        print("No such file: " + jsonl_file_path)
+        return
+    if dataset_type not in codfrel_row_transform_functions.nl_transforms:
+        print("No dataset type found: " + dataset_type)
+        print("Defined dataset types: " + ', '.join([key for key in codfrel_row_transform_functions.nl_transforms]))
+        return
+    for fitness_mode in grid["fitness"]:
+        if fitness_mode not in codfrel.FITNESS_MODES:
+            print("No fitness mode found: " + fitness_mode)
+            print("Defined fitness modes: " + ', '.join(codfrel.FITNESS_MODES))
+            return
+    for stopping_condition in grid["stopping-condition"]:
+        stopping_condition_type, _, stopping_condition_parameter = stopping_condition.partition(":")
+        if codfrel.get_stopping_condition(stopping_condition_type, stopping_condition_parameter) == None:
+            print("No stopping condition type found: " + stopping_condition_type)
+            print("Defined stopping condition types and their params: " + str(codfrel.stopping_conditions_params))
+            return
+    configs = get_sweep_configs(grid)
+    results_dir = os.path.join(CODFREL_SWEEP_DIR, name)
+    os.makedirs(results_dir, exist_ok=True)
+    preprocessed_dir = os.path.join(codfrel.CODFREL_EVAL_DIR, codfrel.CODFREL_EVAL_PREPROCESSED_DIR)
+    os.makedirs(preprocessed_dir, exist_ok=True)
+    print("Configs: " + str(len(configs)))
+    print("Workers: " + str(workers))
+    print("Seed: " + str(seed))
+    # Every config runs with the same seed, so that they start from the same random state
+    if seed == None:
+        seed = random.getrandbits(32)
+    print("Loading dataset...")
+    dataset = codfrel.Dataset(
+        jsonl_file_path=jsonl_file_path,
+        nl_transform_func=codfrel_row_transform_functions.nl_transforms[dataset_type],
+        pl_transform_func=codfrel_row_transform_functions.pl_transforms[dataset_type],
+        max_link_count=max_links_count,
+        max_nl_count=max_nl_count,
+        max_pl_count=max_pl_count,
+        workers=workers
+    )
+    print("NL count: " + str(len(dataset.nl_items)))
+    print("PL count: " + str(len(dataset.pl_items)))
+    print("Links count: " + str(dataset.links_count))
+    print("Preprocessing...")
+    preprocessed_corpus = codfrel.get_cached_preprocessed_corpus(
+        preprocessed_dir, dataset, jsonl_file_path, dataset_type, max_links_count, max_nl_count, max_pl_count, workers
+    )
+    print("Running configs...")
+    global _sweep_dataset, _sweep_preprocessed_corpus
+    _sweep_dataset = dataset
+    _sweep_preprocessed_corpus = preprocessed_corpus
+    results = []
+    results_path = os.path.join(results_dir, SWEEP_RESULTS_FILE_NAME)
+    try:
+        with concurrent.futures.ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context("fork"), initializer=_worker_initialize
+        ) as executor:
+            futures = [
+                executor.submit(_worker_run_config, config_index, configs[config_index], seed)
+                for config_index in range(len(configs))
+            ]
+            try:
+                for future in concurrent.futures.as_completed(futures):
+                    result = future.result()
+                    results.append(result)
+                    print(
+                        "[" + str(len(results)) + "/" + str(len(configs)) + "] "
+                        + ' '.join(["--" + key + "=" + result[key] for key in grid])
+                        + ": F1=" + str(result.get("f1")) + ", MAP@10=" + str(result["MAP@10"])
+                        + " (" + str(round(result["time"], 2)) + "s)"
+                    )
+                    # Written after every config, so that the finished ones are kept if the sweep is stopped
+                    write_sweep_results(results_path, results)
+            except KeyboardInterrupt:
+                print("\nKeyboard interrupt. Cancelling the remaining configs...")
+                for future in futures:
+                    future.cancel()
+    finally:
+        _sweep_dataset = None
+        _sweep_preprocessed_corpus = None
+    write_sweep_results(results_path, results)
+    print("Results: " + results_path)
+
+command_line_options = {
+    **{key: "<value>[,<value>...]" for key in grid_options},
+    "max-nl-count": "<number>",
+    "max-pl-count": "<number>",
+    "workers": "<number-of-worker-processes>",
+    "seed": "<random-seed>",
+}
+
+if __name__ == "__main__":
+    argv, options = codfrel.parse_command_line_args(sys.argv)
+    unknown_options = [key for key in options if key not in command_line_options]
+    if len(argv) != 5 or len(unknown_options) != 0 or "stopping-condition" not in options:
+        if len(unknown_options) != 0:
+            print("Unknown options: " + ' '.join(["--" + key for key in unknown_options]))
+        print("Params: <name> <jsonl-dataset-file-path> <dataset-type> <max-number-of-links>")
+        print("Options: " + ' '.join(["--" + key + "=" + command_line_options[key] for key in command_line_options]))
+        print("--stopping-condition is required, as <type>:<parameter>")
+        print("Stopping condition types and their params: " + str(codfrel.stopping_conditions_params))
+        exit()
+    codfrel_sweep(
+        argv[1],
+        argv[2],
+        argv[3],
+        int(argv[4]),
+        {key: options.get(key, grid_options[key]).split(",") for key in grid_options},
+        max_nl_count=int(options["max-nl-count"]) if "max-nl-count" in options else None,
+        max_pl_count=int(options["max-pl-count"]) if "max-pl-count" in options else None,
+        workers=int(options.get("workers", 1)),
+        seed=int(options["seed"]) if "seed" in options else None
+    )
@@ -0,0 +1,97 @@
+import json
+import time
+
+PHASES = ["selection", "fusion", "mutation", "dedup", "fitness", "sort_trim"]
+COUNTERS = [
+    "iterations", "children", "additive_mutations", "removal_mutations", "removed_lines",
+    "duplicates_removed", "fitness_evaluations",
+]
+
+def _new_phase_times() -> dict[str, float]:
+    return {phase: 0.0 for phase in PHASES}
+
+def _new_counters() -> dict[str, int]:
+    return {counter: 0 for counter in COUNTERS}
+
+def _add_to(target: dict, source: dict):
+    for key in source:
+        target[key] += source[key]
+
+class GATelemetry:
+    # Accumulates the time spent in each phase of CodfrelGeneticAlgorithm.iterate_population and some counters,
+    # per NL item and in total. If trace_path is given, a JSON line is written for every global iteration,
+    # plus a summary line at the end.
+    def __init__(self, trace_path: str|None = None):
+        self.trace_path = trace_path
+        self.trace_file = None
+        self.phase_times = _new_phase_times()
+        self.counters = _new_counters()
+        self.phase_times_by_nl: dict[int, dict[str, float]] = {}
+        self.counters_by_nl: dict[int, dict[str, int]] = {}
+        self.global_iteration_phase_times = _new_phase_times()
+        self.global_iteration_counters = _new_counters()
+        self.global_iteration_start_time = time.perf_counter()
+
+    def add_iteration(self, nl_index: int, phase_times: dict[str, float], counters: dict[str, int]):
+        if nl_index not in self.phase_times_by_nl:
+            self.phase_times_by_nl[nl_index] = _new_phase_times()
+            self.counters_by_nl[nl_index] = _new_counters()
+        _add_to(self.phase_times_by_nl[nl_index], phase_times)
+        _add_to(self.counters_by_nl[nl_index], counters)
+        _add_to(self.global_iteration_phase_times, phase_times)
+        _add_to(self.global_iteration_counters, counters)
+
+    def end_global_iteration(self, global_iteration_number: int, iterated_nl_count: int):
+        now = time.perf_counter()
+        _add_to(self.phase_times, self.global_iteration_phase_times)
+        _add_to(self.counters, self.global_iteration_counters)
+        self._write_trace_line({
+            "type": "global_iteration",
+            "global_iteration": global_iteration_number,
+            "iterated_nl_count": iterated_nl_count,
+            "wall_time": now - self.global_iteration_start_time,
+            "phase_times": self.global_iteration_phase_times,
+            "counters": self.global_iteration_counters,
+        })
+        self.global_iteration_phase_times = _new_phase_times()
+        self.global_iteration_counters = _new_counters()
+        self.global_iteration_start_time = now
+
+    def get_totals(self) -> dict:
+        return {
+            "phase_times": self.phase_times,
+            "counters": self.counters,
+            "phase_times_by_nl": self.phase_times_by_nl,
+            "counters_by_nl": self.counters_by_nl,
+        }
+
+    def merge_totals(self, totals: dict):
+        # For the totals of the worker processes
+        _add_to(self.phase_times, totals["phase_times"])
+        _add_to(self.counters, totals["counters"])
+        for nl_index in totals["phase_times_by_nl"]:
+            self.add_iteration(nl_index, _new_phase_times(), _new_counters())
+            _add_to(self.phase_times_by_nl[nl_index], totals["phase_times_by_nl"][nl_index])
+            _add_to(self.counters_by_nl[nl_index], totals["counters_by_nl"][nl_index])
+
+    def get_summary_str(self) -> str:
+        total_time = sum(self.phase_times.values())
+        lines = []
+        for phase in PHASES:
+            ratio = self.phase_times[phase] / total_time if total_time != 0 else 0
+            lines.append(phase + ": " + str(round(self.phase_times[phase], 3)) + "s (" + str(round(ratio * 100, 1)) + "%)")
+        lines.append(str(self.counters))
+        return '\n'.join(lines)
+
+    def close(self):
+        self._write_trace_line({"type": "summary", **self.get_totals()})
+        if self.trace_file != None:
+            self.trace_file.close()
+            self.trace_file = None
+
+    def _write_trace_line(self, data: dict):
+        if self.trace_path == None:
+            return
+        if self.trace_file == None:
+            self.trace_file = open(self.trace_path, "w")
+        self.trace_file.write(json.dumps(data) + '\n')